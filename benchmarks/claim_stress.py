@@ -0,0 +1,131 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from core.models import Pool, Database, WriteQueue, Drops, Errors, migrate
+# ------ Asyncio ------
+import asyncio
+# ------ Utils ------
+from argparse import ArgumentParser
+from collections import Counter
+from random import Random
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from pathlib import Path
+
+
+async def stress(path: Path, claims: int, members: int, lines: int, max_lines: int, seed: int,
+                 mixed: bool = False) -> None:
+    """
+    This function fires `claims` concurrent claims from `members` members at one vault.
+
+    With `mixed`, half of the claims go through a second card in drop mode
+    on the same vault, starting from a cold drop registry.
+
+    Fails if a line is handed out twice, a member claims a card twice within the cooldown,
+    or a line is neither handed out nor left in the vault once read back from the database.
+    """
+    pool = await Pool(database=str(path), size=4).open()
+    writes: WriteQueue | None = None
+    try:
+        async with pool.writer() as connection:
+            await migrate(connection=connection)
+        writes = WriteQueue(pool=pool).start()
+        async with Database(pool=pool, guild_id=1, owner_id=1, secret_key="benchmark", writes=writes,
+                            drops=Drops() if mixed else None) as db:
+            await db.create_vault(code="stress", storage="\n".join(f"line-{i}" for i in range(lines)))
+            vault = await db.find_vault(code="stress")
+            await db.create_card(vault=vault, channel_id=1, message_id=1, role_id=1, max_lines=max_lines,
+                                 timeout=3600)
+            cards = [await db.get_card(message_id=1)]
+            if mixed:
+                # Created straight in the table, `create_card` would warm the drop queue up front.
+                async with pool.writer() as connection:
+                    await connection.execute("""INSERT INTO cards(vault_id, guild_id, channel_id, message_id, role_id, 
+                    max_lines, timeout, created_at, drop_mode) SELECT vault_id, guild_id, channel_id, 2, role_id, 
+                    max_lines, timeout, created_at, 1 FROM cards WHERE message_id = 1;""")
+                    await connection.commit()
+                cards.append(await db.get_card(message_id=2))
+
+            random = Random(seed)
+            claimers = [(random.randrange(members), random.choice(cards)) for _ in range(claims)]
+
+            async def attempt(member_id: int, card):
+                try:
+                    return (member_id, card["id"]), await db.claim(member_id=member_id, card=card)
+                except Errors.VaultOverLimit:
+                    return (member_id, card["id"]), None
+
+            started = perf_counter()
+            results = await asyncio.gather(*(attempt(member_id, card) for member_id, card in claimers))
+            elapsed = perf_counter() - started
+
+        # Read back without the drop registry, as after a restart.
+        async with Database(pool=pool, guild_id=1, owner_id=1, secret_key="benchmark", writes=writes) as db:
+            exported = BytesIO()
+            await db.export_vault(vault_id=vault["id"], file=exported)
+            length = (await db.find_vault(code="stress"))["length"]
+        remaining = exported.getvalue().decode("utf-8").splitlines()
+
+        handed = Counter(line for _, result in results if isinstance(result, list) for line in result)
+        winners = Counter(claimer for claimer, result in results if isinstance(result, list))
+        duplicates = [line for line, count in handed.items() if count > 1]
+        repeated = [claimer for claimer, count in winners.items() if count > 1]
+        print(f"mode          {'regular and drop cards' if mixed else 'regular card'}")
+        print(f"claims        {claims:,} from {len(set(member_id for member_id, _ in claimers)):,} members")
+        print(f"succeeded     {sum(winners.values()):,}")
+        print(f"on cooldown   {sum(isinstance(result, int) for _, result in results):,}")
+        print(f"vault empty   {sum(result is None for _, result in results):,}")
+        print(f"remaining     {len(remaining):,} lines, length {length:,}")
+        print(f"claims/s      {claims / elapsed:,.0f}")
+        print(f"write queue   {writes.stats}")
+        assert not duplicates, f"{len(duplicates)} lines handed out more than once"
+        assert not repeated, f"{len(repeated)} members claimed a card more than once"
+        assert not handed.keys() & set(remaining), "lines handed out are still in the vault"
+        assert len(handed) + len(remaining) == lines, f"{lines - len(handed) - len(remaining)} lines were lost"
+        assert length == len(remaining), f"vault length is {length} but {len(remaining)} lines remain"
+        print("OK, no line was handed out twice or lost.")
+    finally:
+        if writes is not None:
+            await writes.close()
+        await pool.close()
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Concurrent claims against a single vault.")
+    parser.add_argument("--claims", type=int, default=5000, help="concurrent claims")
+    parser.add_argument("--members", type=int, default=3000, help="distinct members clicking")
+    parser.add_argument("--lines", type=int, default=4000, help="lines in the vault")
+    parser.add_argument("--max-lines", type=int, default=1, help="lines handed out per claim")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mixed", action="store_true", help="also claim through a drop mode card on the same vault")
+    args = parser.parse_args()
+    with TemporaryDirectory() as directory:
+        await stress(path=Path(directory) / "stress.db", claims=args.claims, members=args.members,
+                     lines=args.lines, max_lines=args.max_lines, seed=args.seed, mixed=args.mixed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
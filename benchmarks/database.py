@@ -0,0 +1,223 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from core.models import Pool, Database, WriteQueue, Errors, migrate
+# ------ Asyncio ------
+import asyncio
+# ------ Utils ------
+from argparse import ArgumentParser
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from pathlib import Path
+from typing import Awaitable, Callable, List
+from io import BytesIO
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Windows, peak RSS is not reported.
+    resource = None
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    This function returns the nearest-rank percentile of `samples`.
+
+    :return:`float`
+    """
+    ordered = sorted(samples)
+    return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+
+def result(operation: str, size: int, concurrency: int, timings: List[float], elapsed: float,
+           errors: int = 0) -> dict:
+    return {"operation": operation,
+            "size": size,
+            "concurrency": concurrency,
+            "ops": len(timings),
+            "errors": errors,
+            "ops_per_s": round(len(timings) / elapsed, 2) if elapsed else None,
+            "p50_ms": round(percentile(timings, 50) * 1000, 4),
+            "p99_ms": round(percentile(timings, 99) * 1000, 4)}
+
+
+async def timed(operation: Callable[[], Awaitable]) -> float:
+    started = perf_counter()
+    await operation()
+    return perf_counter() - started
+
+
+async def sequential(operations: List[Callable[[], Awaitable]]) -> tuple:
+    started = perf_counter()
+    timings = [await timed(operation) for operation in operations]
+    return timings, perf_counter() - started
+
+
+async def bench(path: Path, size: int, repeats: int, concurrency: List[int], cards: int) -> List[dict]:
+    """
+    This function times every vault and card operation on a vault of `size` lines.
+
+    :return:`List[dict]`
+    """
+    pool = await Pool(database=str(path), size=4).open()
+    writes: WriteQueue | None = None
+    results: List[dict] = []
+    try:
+        async with pool.writer() as connection:
+            await migrate(connection=connection)
+        writes = WriteQueue(pool=pool).start()
+        storage = "\n".join(f"line-{i:08d}-{'x' * 24}" for i in range(size))
+        async with Database(pool=pool, guild_id=1, owner_id=1, secret_key="benchmark", writes=writes) as db:
+            codes = [f"bench-{index}" for index in range(repeats)]
+            timings, elapsed = await sequential([lambda code=code: db.create_vault(code=code, storage=storage)
+                                                 for code in codes])
+            results.append(result("create_vault", size, 1, timings, elapsed))
+
+            vaults = [await db.find_vault(code=code) for code in codes]
+            vault_ids = [vault["id"] for vault in vaults]
+            # Every line decrypted, the cost of reading a whole vault.
+            timings, elapsed = await sequential([lambda vault_id=vault_id: db.export_vault(vault_id=vault_id,
+                                                                                          file=BytesIO())
+                                                 for vault_id in vault_ids])
+            results.append(result("export_vault", size, 1, timings, elapsed))
+            # The last page, it should cost the same as the first one whatever the size.
+            timings, elapsed = await sequential([lambda vault_id=vault_id: db.read_page(vault_id=vault_id, page=size)
+                                                 for vault_id in vault_ids])
+            results.append(result("read_page", size, 1, timings, elapsed))
+            timings, elapsed = await sequential([lambda vault_id=vault_id: db.update_vault(vault_id=vault_id,
+                                                                                          storage=storage)
+                                                 for vault_id in vault_ids])
+            results.append(result("update_vault", size, 1, timings, elapsed))
+
+            # One fresh vault per concurrency level, every claimer is a different member.
+            member_id = 0
+            for level in concurrency:
+                code = f"claim-{level}"
+                await db.create_vault(code=code, storage=storage)
+                vault = await db.find_vault(code=code)
+                message_id = 1_000_000 + level
+                await db.create_card(vault=vault, channel_id=1, message_id=message_id, role_id=1, max_lines=1,
+                                     timeout=3600)
+                card = await db.get_card(message_id=message_id)
+                errors = 0
+
+                async def attempt(member: int) -> float:
+                    nonlocal errors
+                    started = perf_counter()
+                    try:
+                        await db.claim(member_id=member, card=card)
+                    except Errors.VaultOverLimit:
+                        # Small vaults run dry, the attempt still went through the whole path.
+                        errors += 1
+                    return perf_counter() - started
+
+                started = perf_counter()
+                timings = await asyncio.gather(*(attempt(member_id + index) for index in range(level)))
+                elapsed = perf_counter() - started
+                member_id += level
+                results.append(result("claim", size, level, list(timings), elapsed, errors=errors))
+
+            vault = vaults[0]
+            for index in range(cards):
+                await db.create_card(vault=vault, channel_id=1, message_id=index + 1, role_id=1, max_lines=1,
+                                     timeout=0)
+
+            async def get_cards() -> None:
+                async for _ in db.get_cards(guild_id=1):
+                    pass
+
+            timings, elapsed = await sequential([get_cards for _ in range(repeats)])
+            results.append(dict(result("get_cards", size, 1, timings, elapsed), cards=cards))
+
+            timings, elapsed = await sequential([lambda vault_id=vault_id: db.remove_vault(vault_id=vault_id)
+                                                 for vault_id in vault_ids])
+            results.append(result("remove_vault", size, 1, timings, elapsed))
+        return results
+    finally:
+        if writes is not None:
+            await writes.close()
+        await pool.close()
+
+
+def worker(size: int, repeats: int, concurrency: List[int], cards: int, queue) -> None:
+    # Every size runs in a fresh process, so the peak RSS belongs to that size only.
+    with TemporaryDirectory() as directory:
+        results = asyncio.run(bench(path=Path(directory) / "bench.db", size=size, repeats=repeats,
+                                    concurrency=concurrency, cards=cards))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+    for entry in results:
+        entry["peak_rss_kb"] = peak
+    queue.put(results)
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Database layer throughput, latency and memory, as JSON.")
+    parser.add_argument("--sizes", default="10,1000,100000,1000000", help="comma separated vault sizes")
+    parser.add_argument("--concurrency", default="1,10,100,1000", help="comma separated concurrent claimers")
+    parser.add_argument("--repeats", type=int, default=0, help="runs of every operation, 0 scales with the size")
+    parser.add_argument("--cards", type=int, default=100, help="cards listed by get_cards")
+    parser.add_argument("--output", default=None, help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    context = get_context("spawn")
+    results: List[dict] = []
+    for size in map(int, args.sizes.split(",")):
+        repeats = args.repeats or max(3, min(50, 1_000_000 // max(size, 1) // 100))
+        queue = context.Queue()
+        process = context.Process(target=worker, args=(size, repeats, [int(level) for level in
+                                                                       args.concurrency.split(",")],
+                                                       args.cards, queue))
+        process.start()
+        results.extend(queue.get())
+        process.join()
+        print(f"size {size:,} done", file=sys.stderr)
+
+    report = {"revision": revision(),
+              "python": platform.python_version(),
+              "sqlite": sqlite3.sqlite_version,
+              "platform": platform.platform(),
+              "results": results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
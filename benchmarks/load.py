@@ -0,0 +1,320 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from core import Bot
+from core.cogs.create import MyView
+# ------ Discord ------
+from discord import InteractionType, Embed, ui
+# ------ Asyncio ------
+import asyncio
+# ------ Utils ------
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from itertools import count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+import json
+import os
+
+# Snowflake-sized ids, handed out in order.
+_ids = count(10 ** 17)
+
+
+class FakeRole(object):
+    __slots__ = ("id", "mention")
+
+    def __init__(self, id: Optional[int] = None):
+        self.id = id or next(_ids)
+        self.mention = f"<@&{self.id}>"
+
+
+class FakeMember(object):
+    __slots__ = ("id", "roles")
+
+    def __init__(self, roles: List[FakeRole]):
+        self.id = next(_ids)
+        self.roles = roles
+
+    def __str__(self) -> str:
+        return f"member-{self.id}"
+
+
+class FakeMessage(object):
+    __slots__ = ("id", "channel", "embed", "view", "deleted")
+
+    def __init__(self, channel: "FakeChannel", embed: Optional[Embed] = None, view: Optional[ui.View] = None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.embed = embed
+        self.view = view
+        self.deleted = False
+
+    async def edit(self, view: Optional[ui.View] = None, **_: Any) -> "FakeMessage":
+        self.view = view
+        return self
+
+    async def delete(self) -> None:
+        self.deleted = True
+
+
+class FakeChannel(object):
+    __slots__ = ("id", "messages")
+
+    def __init__(self):
+        self.id = next(_ids)
+        self.messages: Dict[int, FakeMessage] = {}
+
+    async def send(self, embed: Optional[Embed] = None, view: Optional[ui.View] = None, **_: Any) -> FakeMessage:
+        message = FakeMessage(channel=self, embed=embed, view=view)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id: int) -> Optional[FakeMessage]:
+        return self.messages.get(message_id)
+
+
+class FakeGuild(object):
+    __slots__ = ("id", "owner_id", "channel", "filesize_limit")
+
+    def __init__(self, channel: FakeChannel):
+        self.id = next(_ids)
+        self.owner_id = next(_ids)
+        self.channel = channel
+        self.filesize_limit = 25 * 1024 * 1024
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channel if channel_id == self.channel.id else None
+
+
+class FakeResponse(object):
+    __slots__ = ("messages", "modal", "deferred")
+
+    def __init__(self):
+        self.messages: List[Embed] = []
+        self.modal: Optional[ui.Modal] = None
+        self.deferred = False
+
+    async def send_message(self, embed: Optional[Embed] = None, **_: Any) -> None:
+        self.messages.append(embed)
+
+    async def send_modal(self, modal: ui.Modal) -> None:
+        self.modal = modal
+
+    async def defer(self, **_: Any) -> None:
+        self.deferred = True
+
+
+class FakeFollowup(object):
+    __slots__ = ("response",)
+
+    def __init__(self, response: FakeResponse):
+        self.response = response
+
+    async def send(self, embed: Optional[Embed] = None, **_: Any) -> None:
+        self.response.messages.append(embed)
+
+
+class FakeInteraction(object):
+    __slots__ = ("client", "guild", "guild_id", "channel", "user", "message", "type", "data", "response", "followup")
+
+    def __init__(self, client: Bot, guild: FakeGuild, user: FakeMember, message: Optional[FakeMessage] = None,
+                 custom_id: Optional[str] = None):
+        """
+        Stand-in for `discord.Interaction`, only what the cogs touch.
+        """
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = guild.channel
+        self.user = user
+        self.message = message
+        self.type = InteractionType.component if custom_id is not None else InteractionType.application_command
+        self.data = {"custom_id": custom_id} if custom_id is not None else {}
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(response=self.response)
+
+    async def edit_original_response(self, embed: Optional[Embed] = None, **_: Any) -> None:
+        self.response.messages.append(embed)
+
+
+def outcome(interaction: FakeInteraction) -> str:
+    # Errors come from `embed_wrong`, their message starts on the second line of the description.
+    if interaction.response.modal is not None:
+        return "modal"
+    if len(interaction.response.messages) == 0:
+        return "no response"
+    embed = interaction.response.messages[-1]
+    if embed.title is not None:
+        return embed.title
+    return embed.description.split("\n")[1]
+
+
+def fill(modal: ui.Modal, **values: str) -> None:
+    # Modal inputs are read-only, Discord fills them on submit.
+    for name, value in values.items():
+        getattr(modal, name)._value = value
+
+
+class Harness(object):
+    __slots__ = ("bot", "guild", "role", "members", "timings", "outcomes")
+
+    def __init__(self, bot: Bot, members: int):
+        self.bot = bot
+        self.guild = FakeGuild(channel=FakeChannel())
+        self.role = FakeRole()
+        self.members = [FakeMember(roles=[self.role]) for _ in range(members)]
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+
+    async def run(self, handler: str, interaction: FakeInteraction, callback) -> FakeInteraction:
+        started = perf_counter()
+        await callback
+        self.timings[handler].append(perf_counter() - started)
+        self.outcomes[handler][outcome(interaction)] += 1
+        return interaction
+
+    def interaction(self, **kwargs: Any) -> FakeInteraction:
+        return FakeInteraction(client=self.bot, guild=self.guild, **kwargs)
+
+    async def create_vault(self, code: str, lines: int) -> None:
+        vault_cog = self.bot.get_cog("Vault")
+        interaction = self.interaction(user=self.members[0])
+        await self.run("vault create", interaction, vault_cog.slash.callback(vault_cog, interaction, option="create",
+                                                                            code=code))
+        modal = interaction.response.modal
+        fill(modal, storage_ui="\n".join(f"line-{index:08d}" for index in range(lines)))
+        submit = self.interaction(user=self.members[0])
+        await self.run("vault submit", submit, modal.on_submit(submit))
+
+    async def create_card(self, code: str, max_lines: int, timeout: str, drop: bool) -> FakeMessage:
+        create_cog = self.bot.get_cog("Create")
+        interaction = self.interaction(user=self.members[0])
+        await self.run("create", interaction, create_cog.slash.callback(create_cog, interaction, code=code,
+                                                                       role=self.role, drop=drop))
+        modal = interaction.response.modal
+        fill(modal, title_ui="Load test", description_ui="", thumbnail_ui="", max_lines_ui=str(max_lines),
+             timeout_ui=timeout)
+        submit = self.interaction(user=self.members[0])
+        await self.run("create submit", submit, modal.on_submit(submit))
+        return list(self.guild.channel.messages.values())[-1]
+
+    async def click(self, message: FakeMessage, member: FakeMember, legacy: bool) -> None:
+        if legacy:
+            # Cards made before custom id encoding go through the persistent view.
+            view = MyView()
+            interaction = self.interaction(user=member, message=message, custom_id=view.green.custom_id)
+            await self.run("claim (MyView.green)", interaction, view.green.callback(interaction))
+        else:
+            custom_id = message.view.green.custom_id
+            interaction = self.interaction(user=member, message=message, custom_id=custom_id)
+            create_cog = self.bot.get_cog("Create")
+            await self.run("claim (on_interaction)", interaction, create_cog.on_interaction(interaction))
+
+    async def open_vault(self, code: str) -> None:
+        vault_cog = self.bot.get_cog("Vault")
+        interaction = self.interaction(user=self.members[0])
+        await self.run("vault open", interaction, vault_cog.slash.callback(vault_cog, interaction, option="open",
+                                                                          code=code))
+
+    def report(self, elapsed: float) -> dict:
+        report = {}
+        for handler, timings in self.timings.items():
+            ordered = sorted(timings)
+            report[handler] = {"calls": len(ordered),
+                               "per_s": round(len(ordered) / elapsed, 2),
+                               "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                               "p99_ms": round(ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)] * 1000, 3),
+                               "max_ms": round(ordered[-1] * 1000, 3),
+                               "outcomes": dict(self.outcomes[handler])}
+        return report
+
+
+async def load(args) -> dict:
+    """
+    This function runs the cogs against fake interactions arriving at a fixed rate.
+
+    :return:`dict` per handler report
+    """
+    bot = Bot(cluster_id=1)
+    bot.secret_key = "load-test"
+    async with bot:
+        # The real startup without logging in, cluster 1 never syncs the command tree.
+        await bot.setup_hook()
+        harness = Harness(bot=bot, members=args.members)
+        await harness.create_vault(code="load", lines=args.lines)
+        card = await harness.create_card(code="load", max_lines=args.max_lines, timeout=args.timeout,
+                                         drop=args.drop)
+        # Only the load itself is reported.
+        harness.timings.clear()
+        harness.outcomes.clear()
+
+        tasks: List[asyncio.Task] = []
+        clicks = int(args.rate * args.duration)
+        opens = int(args.open_rate * args.duration)
+        arrivals = sorted([(index / args.rate, "click", index) for index in range(clicks)] +
+                          [(index / args.open_rate, "open", index) for index in range(opens)])
+        started = perf_counter()
+        for at, kind, index in arrivals:
+            delay = started + at - perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if kind == "click":
+                member = harness.members[index % len(harness.members)]
+                tasks.append(asyncio.create_task(harness.click(message=card, member=member, legacy=args.legacy)))
+            else:
+                tasks.append(asyncio.create_task(harness.open_vault(code="load")))
+        await asyncio.gather(*tasks)
+        elapsed = perf_counter() - started
+        report = harness.report(elapsed=elapsed)
+        bot.guild_flusher.cancel()
+    return report
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Drives the real cog handlers with fake Discord interactions.")
+    parser.add_argument("--rate", type=float, default=500, help="Claim clicks per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--members", type=int, default=2000, help="distinct members clicking")
+    parser.add_argument("--lines", type=int, default=10_000, help="lines in the vault")
+    parser.add_argument("--max-lines", type=int, default=1, help="lines handed out per claim")
+    parser.add_argument("--timeout", default="1d", help="card cooldown, e.g. 1d 5h 10m 30s")
+    parser.add_argument("--drop", action="store_true", help="serve the card in drop mode")
+    parser.add_argument("--legacy", action="store_true", help="click through MyView.green like pre-encoding cards")
+    parser.add_argument("--open-rate", type=float, default=0.5, help="/vault open per second alongside the clicks")
+    args = parser.parse_args()
+    with TemporaryDirectory() as directory:
+        # The bot opens guilds.db in the working directory.
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            report = asyncio.run(load(args))
+        finally:
+            os.chdir(cwd)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from core.models import Pool, Database, Offload, migrate
+# ------ Asyncio ------
+import asyncio
+# ------ Utils ------
+from argparse import ArgumentParser
+from statistics import quantiles
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from pathlib import Path
+from typing import List
+
+
+async def ticker(interval: float, lags: List[float], stop: asyncio.Event) -> None:
+    """
+    This function records how late the event loop wakes up a task sleeping for `interval`.
+
+    :return:`None`
+    """
+    while not stop.is_set():
+        started = perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(perf_counter() - started - interval, 0.0))
+
+
+async def bench(path: Path, kind: str, size: int, rounds: int, threshold: int) -> List[float]:
+    """
+    This function creates and rewrites a vault of `size` lines while measuring loop lag.
+
+    :return:`List[float]` lag samples in seconds
+    """
+    pool = await Pool(database=str(path), size=1).open()
+    offload = Offload(kind=kind, threshold=threshold)
+    lags: List[float] = []
+    stop = asyncio.Event()
+    try:
+        async with pool.writer() as connection:
+            await migrate(connection=connection)
+        storage = "\n".join(f"line-{i:08d}-{'x' * 24}" for i in range(size))
+        async with Database(pool=pool, guild_id=1, owner_id=1, secret_key="benchmark", offload=offload) as db:
+            task = asyncio.create_task(ticker(interval=0.001, lags=lags, stop=stop))
+            for index in range(rounds):
+                vault_id = await db.create_vault(code=f"bench-{index}", storage=storage)
+                await db.update_vault(vault_id=vault_id, storage=storage)
+            stop.set()
+            await task
+        return lags
+    finally:
+        offload.close()
+        await pool.close()
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Event loop lag while large vaults are encrypted.")
+    parser.add_argument("--size", type=int, default=200_000, help="lines per vault")
+    parser.add_argument("--rounds", type=int, default=3, help="vaults created then rewritten")
+    parser.add_argument("--threshold", type=int, default=64 * 1024, help="bytes before work is offloaded")
+    parser.add_argument("--kinds", default="none,thread,process", help="comma separated executor kinds")
+    args = parser.parse_args()
+
+    print(f"{'executor':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}")
+    with TemporaryDirectory() as directory:
+        for kind in args.kinds.split(","):
+            lags = await bench(path=Path(directory) / f"{kind}.db", kind=kind, size=args.size, rounds=args.rounds,
+                               threshold=args.threshold)
+            cuts = quantiles(lags, n=100)
+            print(f"{kind:>10} {cuts[49] * 1000:>10.2f} {cuts[98] * 1000:>10.2f} {max(lags) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from core.models import Pool, Database, migrate
+# ------ Asyncio ------
+import asyncio
+# ------ Utils ------
+from argparse import ArgumentParser
+from statistics import mean
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from pathlib import Path
+
+
+async def bench(path: Path, size: int, claims: int, max_lines: int) -> float:
+    """
+    This function fills a vault with `size` lines and times `claims` claims on it.
+
+    :return:`float` mean seconds per claim
+    """
+    pool = await Pool(database=str(path), size=1).open()
+    try:
+        async with pool.writer() as connection:
+            await migrate(connection=connection)
+        async with Database(pool=pool, guild_id=1, owner_id=1, secret_key="benchmark") as db:
+            await db.create_vault(code="bench", storage="\n".join(f"line-{i}" for i in range(size)))
+            vault = await db.find_vault(code="bench")
+            await db.create_card(vault=vault, channel_id=1, message_id=1, role_id=1, max_lines=max_lines, timeout=0)
+            card = await db.get_card(message_id=1)
+            timings = []
+            for member_id in range(claims):
+                started = perf_counter()
+                await db.claim(member_id=member_id, card=card)
+                timings.append(perf_counter() - started)
+        return mean(timings)
+    finally:
+        await pool.close()
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="Claim latency against vault size.")
+    parser.add_argument("--sizes", default="1000,10000,100000,200000", help="comma separated vault sizes")
+    parser.add_argument("--claims", type=int, default=200, help="claims timed per vault")
+    parser.add_argument("--max-lines", type=int, default=1, help="lines handed out per claim")
+    args = parser.parse_args()
+
+    print(f"{'lines':>10} {'claim (ms)':>12}")
+    with TemporaryDirectory() as directory:
+        for size in map(int, args.sizes.split(",")):
+            path = Path(directory) / f"vault-{size}.db"
+            seconds = await bench(path=path, size=size, claims=args.claims, max_lines=args.max_lines)
+            print(f"{size:>10,} {seconds * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -23,30 +23,57 @@ DEALINGS IN THE SOFTWARE.
 """
 
 # ------ Core ------
-from .models import logger
+from .models import (logger, migrate, warm_cards, load_cooldowns, load_guilds, flush_guilds, Pool, Database, CardCache,
+                     GuildRegistry, Cooldowns, WriteQueue, Drops, Offload, REGISTRY, PROFILER, monitor_lag,
+                     start_exporter)
 
 # ------ Discord ------
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.errors import LoginFailure, DiscordException
 
+# ------ Asyncio ------
+import asyncio
+# ------ Http ------
+from aiohttp import web
+
 # ------ Environment ------
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+# ------ Time ------
+from time import perf_counter
+# ------ Typing ------
+from typing import Optional, List
 
 
-class Bot(commands.Bot):
-    __slots__ = ("logger", "secret_key")
+class Bot(commands.AutoShardedBot):
+    __slots__ = ("logger", "secret_key", "cluster_id", "pool", "cards", "registry", "cooldowns", "writes", "drops",
+                 "offload", "exporter", "lag_monitor")
 
-    def __init__(self):
+    def __init__(self, shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None,
+                 cluster_id: int = 0):
+        """
+        Without `shard_ids` every shard recommended by Discord runs in this process,
+        a cluster only runs its own range (see `core.cluster`).
+        """
         intents = discord.Intents.default()
         intents.members = True
-        super().__init__(intents=intents, command_prefix=None)
+        super().__init__(intents=intents, command_prefix=None, shard_ids=shard_ids, shard_count=shard_count)
 
         # logging event.
-        self.logger = logger()
+        self.cluster_id = cluster_id
+        self.logger = logger(filename="debug.log" if shard_ids is None else f"debug-{cluster_id}.log")
         self.secret_key: str = ""
+        self.pool: Pool | None = None
+        self.cards: CardCache | None = None
+        self.registry: GuildRegistry = GuildRegistry()
+        self.cooldowns: Cooldowns = Cooldowns()
+        self.writes: WriteQueue | None = None
+        self.drops: Drops = Drops()
+        self.offload: Offload | None = None
+        self.exporter: web.AppRunner | None = None
+        self.lag_monitor: asyncio.Task | None = None
 
     async def on_connect(self) -> None:
         self.logger.info(f"Connected as {self.user} with ID {self.user.id}")
@@ -60,18 +87,132 @@ class Bot(commands.Bot):
                              f" https://discord.com/api/oauth2/authorize?client_id={self.application_id}"
                              f"&permissions=8&scope=bot%20applications.commands")
 
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        self.registry.resolve(guild_id=guild.id)
+
+    @tasks.loop(seconds=5.0)
+    async def guild_flusher(self) -> None:
+        """
+        This function writes newly seen guilds to the database in batches.
+        """
+        try:
+            await flush_guilds(pool=self.pool, guilds=self.registry)
+        except Exception as error:
+            self.logger.error(msg=f"Unable to save new guilds: {error}")
+
+    def database(self, guild_id: int, owner_id: int) -> Database:
+        """
+        This function returns a database context that borrows from the bot pool.
+
+        :return:`Database`
+        """
+        return Database(pool=self.pool, guild_id=guild_id, owner_id=owner_id, secret_key=self.secret_key,
+                        cards=self.cards, guilds=self.registry, writes=self.writes, drops=self.drops,
+                        offload=self.offload, cooldowns=self.cooldowns)
+
     async def setup_hook(self) -> None:
+        # ------------------------
+        # Opening database pool.
+        self.pool = await Pool(database="guilds.db", size=int(os.getenv("POOL_SIZE", 4))).open()
+        async with self.pool.writer() as connection:
+            version = await migrate(connection=connection)
+        self.logger.info(msg=f"Database schema is at version {version}.")
+        self.writes = WriteQueue(pool=self.pool,
+                                 batch_size=int(os.getenv("WRITE_BATCH_SIZE", 64)),
+                                 interval=float(os.getenv("WRITE_INTERVAL_MS", 5)) / 1000,
+                                 depth=int(os.getenv("WRITE_QUEUE_DEPTH", 1024))).start()
+        self.offload = Offload(kind=os.getenv("CRYPTO_EXECUTOR", "thread"),
+                               workers=int(os.getenv("CRYPTO_WORKERS", 0)) or None,
+                               threshold=int(os.getenv("CRYPTO_THRESHOLD", 64 * 1024)))
+        # ------------------------
+        # Loading guild registry.
+        self.logger.info(msg=f"Guild registry loaded with {await load_guilds(pool=self.pool, guilds=self.registry)}"
+                             f" guilds.")
+        self.guild_flusher.start()
+        # ------------------------
+        # Warming card cache.
+        self.cards = CardCache(size=int(os.getenv("CARD_CACHE_SIZE", 10_000)),
+                               ttl=float(os.getenv("CARD_CACHE_TTL", 3600)))
+        started = perf_counter()
+        warmed = await warm_cards(pool=self.pool, cards=self.cards,
+                                  shard_ids=self.shard_ids, shard_count=self.shard_count)
+        self.logger.info(msg=f"Card cache warmed with {warmed} cards in {(perf_counter() - started) * 1000:.1f}ms.")
+        # Members still on cooldown are rejected without a query.
+        indexed = await load_cooldowns(pool=self.pool, cooldowns=self.cooldowns,
+                                       shard_ids=self.shard_ids, shard_count=self.shard_count)
+        self.logger.info(msg=f"Cooldown index loaded with {indexed} claims.")
         # ------------------
         # Loading extensions.
-        for extension in ["vault", "create"]:
+        for extension in ["vault", "create", "admin"]:
             try:
                 await self.load_extension(name=f'core.cogs.{extension}')
             except DiscordException:
                 self.logger.error(msg=f"Unable to load `{extension}` extension.")
         # -------------------
+        # Metrics, off unless a port is set.
+        self.register_metrics()
+        port = os.getenv("METRICS_PORT")
+        if port:
+            # Each cluster listens on its own port.
+            port = int(port) + self.cluster_id
+            self.exporter = await start_exporter(port=port, host=os.getenv("METRICS_HOST", "127.0.0.1"))
+            self.lag_monitor = asyncio.create_task(monitor_lag())
+            self.logger.info(msg=f"Metrics are served on port {port} at /metrics.")
+        # Handler profiling, off unless a rate is set.
+        PROFILER.directory = os.getenv("PROFILE_DIR", "profiles")
+        PROFILER.set_rate(rate=float(os.getenv("PROFILE_RATE", 0)))
+        # -------------------
         # sync slash commands.
-        # syncing globally may take an hour.
-        await self.tree.sync()
+        # syncing globally may take an hour, one cluster is enough.
+        if self.cluster_id == 0:
+            await self.tree.sync()
+
+    def register_metrics(self) -> None:
+        """
+        This function exposes the bot components stats and the gateway latency as metrics.
+        """
+        REGISTRY.stats(name="claimify_pool", help="Database pool wait-time metrics.",
+                       function=lambda: self.pool.stats if self.pool is not None else {})
+        REGISTRY.stats(name="claimify_write_queue", help="Group-commit write queue metrics.",
+                       function=lambda: self.writes.stats if self.writes is not None else {})
+        REGISTRY.stats(name="claimify_card_cache", help="Card cache metrics.",
+                       function=lambda: self.cards.stats if self.cards is not None else {})
+        REGISTRY.stats(name="claimify_cooldowns", help="Cooldown index metrics.",
+                       function=lambda: self.cooldowns.stats)
+        REGISTRY.stats(name="claimify_drops", help="Drop mode metrics.", function=lambda: self.drops.stats)
+        REGISTRY.stats(name="claimify_crypto_executor", help="Crypto executor metrics.",
+                       function=lambda: self.offload.stats if self.offload is not None else {})
+        REGISTRY.stats(name="claimify_profiler", help="Handler profiling metrics.", function=lambda: PROFILER.stats)
+        REGISTRY.gauge(name="claimify_gateway_latency_seconds", help="Heartbeat latency of every shard.",
+                       labels=("shard",),
+                       function=lambda: {(str(shard_id),): latency for shard_id, latency in self.latencies})
+
+    async def close(self) -> None:
+        await super().close()
+        await self.drops.close()
+        if self.lag_monitor is not None:
+            self.lag_monitor.cancel()
+            self.lag_monitor = None
+        if self.exporter is not None:
+            await self.exporter.cleanup()
+            self.exporter = None
+        if self.writes is not None:
+            await self.writes.close()
+            self.logger.info(msg=f"Write queue stats: {self.writes.stats}")
+            self.writes = None
+        if self.pool is not None:
+            self.guild_flusher.cancel()
+            await flush_guilds(pool=self.pool, guilds=self.registry)
+            self.logger.info(msg=f"Database pool stats: {self.pool.stats}")
+            await self.pool.close()
+            self.pool = None
+        if self.cards is not None:
+            self.logger.info(msg=f"Card cache stats: {self.cards.stats}")
+        self.logger.info(msg=f"Drop mode stats: {self.drops.stats}")
+        if self.offload is not None:
+            self.logger.info(msg=f"Crypto executor stats: {self.offload.stats}")
+            self.offload.close()
+            self.offload = None
 
     async def run_bot(self) -> None:
         async with self:
@@ -82,7 +223,11 @@ class Bot(commands.Bot):
                 load_dotenv(dotenv_path=dotenv_path)
                 token = os.getenv('TOKEN')
                 self.secret_key = os.getenv('SECRET_KEY')
-                self.logger.info("Launching the bot...")
+                if self.shard_ids is None:
+                    self.logger.info("Launching the bot...")
+                else:
+                    self.logger.info(f"Launching cluster {self.cluster_id} with shards {self.shard_ids} of "
+                                     f"{self.shard_count}...")
                 if self.secret_key:
                     if token:
                         await self.start(token=os.getenv('TOKEN'), reconnect=True)
@@ -0,0 +1,198 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from .bot import Bot
+from .models import logger, stop_logging
+# ------ Asyncio ------
+from asyncio import AbstractEventLoop, SelectorEventLoop, set_event_loop
+# ------ Multiprocessing ------
+from multiprocessing import get_context
+from multiprocessing.process import BaseProcess
+# ------ Time ------
+from time import sleep, monotonic
+# ------ Typing ------
+from typing import Optional, List, Dict
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+EVENT_LOOPS = ("auto", "uvloop", "selector")
+
+
+def shard_ranges(shard_count: int, clusters: int) -> List[List[int]]:
+    """
+    This function splits the shards into contiguous ranges, one per cluster.
+
+    :return:`List[List[int]]`
+    """
+    clusters = max(min(clusters, shard_count), 1)
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for cluster in range(clusters):
+        end = start + size + (1 if cluster < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def new_event_loop(name: str = "auto") -> AbstractEventLoop:
+    """
+    This function creates the event loop named `name`.
+
+    "auto" and "uvloop" use uvloop when it is installed, falling back to the
+    selector loop otherwise, "selector" always uses asyncio's selector loop.
+
+    :return:`AbstractEventLoop`
+    """
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"Unknown event loop {name!r}, expected one of {', '.join(EVENT_LOOPS)}.")
+    if name != "selector" and uvloop is not None:
+        return uvloop.new_event_loop()
+    return SelectorEventLoop()
+
+
+def run(shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None, cluster_id: int = 0,
+        loop_name: str = "auto") -> None:
+    """
+    This function runs a bot on its own event loop until it is closed.
+
+    :return:`None`
+    """
+    loop = new_event_loop(name=loop_name)
+    set_event_loop(loop)
+    bot = Bot(shard_ids=shard_ids, shard_count=shard_count, cluster_id=cluster_id)
+    if loop_name == "uvloop" and uvloop is None:
+        bot.logger.warning(msg="uvloop is not installed, falling back to the selector event loop.")
+    bot.logger.info(msg=f"Running on {type(loop).__module__}.{type(loop).__name__}.")
+    try:
+        loop.run_until_complete(bot.run_bot())
+    except KeyboardInterrupt:
+        # Drains the write queue and closes the pool, its connection threads would keep the process alive.
+        loop.run_until_complete(bot.close())
+    finally:
+        loop.close()
+        stop_logging()
+
+
+class Supervisor(object):
+    __slots__ = ("shard_count", "ranges", "loop_name", "logger", "processes", "started", "restarts", "pending",
+                 "_context")
+
+    def __init__(self, shard_count: int, clusters: int, loop_name: str = "auto"):
+        """
+        Runs every cluster in its own process and restarts the ones that crash.
+
+        Clusters share `guilds.db`, which is safe since the pool runs in WAL
+        mode with a busy timeout and the write queue retries busy batches.
+        A cluster that exits cleanly is not restarted.
+        """
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count=shard_count, clusters=clusters)
+        self.loop_name = loop_name
+        self.logger = logger()
+        self.processes: Dict[int, BaseProcess] = {}
+        self.started: Dict[int, float] = {}
+        self.restarts: Dict[int, int] = {cluster_id: 0 for cluster_id in range(len(self.ranges))}
+        # Crashed clusters waiting for their restart time.
+        self.pending: Dict[int, float] = {}
+        self._context = get_context("spawn")
+
+    def start(self, cluster_id: int) -> None:
+        process = self._context.Process(target=run, name=f"cluster-{cluster_id}",
+                                        kwargs={"shard_ids": self.ranges[cluster_id],
+                                                "shard_count": self.shard_count,
+                                                "cluster_id": cluster_id,
+                                                "loop_name": self.loop_name})
+        process.start()
+        self.processes[cluster_id] = process
+        self.started[cluster_id] = monotonic()
+        self.logger.info(msg=f"Cluster {cluster_id} started (pid {process.pid}) with shards {self.ranges[cluster_id]}.")
+
+    def backoff(self, cluster_id: int) -> float:
+        # A cluster that stayed up for a while starts over with a short delay.
+        if monotonic() - self.started[cluster_id] > 60:
+            self.restarts[cluster_id] = 0
+        self.restarts[cluster_id] += 1
+        return min(2.0 ** self.restarts[cluster_id], 60.0)
+
+    def run(self) -> None:
+        """
+        This function starts every cluster and watches them until they all exit.
+
+        :return:`None`
+        """
+        for cluster_id in range(len(self.ranges)):
+            self.start(cluster_id=cluster_id)
+        try:
+            while len(self.processes) + len(self.pending) != 0:
+                sleep(1)
+                for cluster_id, process in list(self.processes.items()):
+                    if process.is_alive():
+                        continue
+                    del self.processes[cluster_id]
+                    if process.exitcode == 0:
+                        self.logger.info(msg=f"Cluster {cluster_id} exited.")
+                    else:
+                        delay = self.backoff(cluster_id=cluster_id)
+                        self.logger.error(msg=f"Cluster {cluster_id} crashed with exit code {process.exitcode},"
+                                              f" restarting in {delay:.0f}s.")
+                        self.pending[cluster_id] = monotonic() + delay
+                for cluster_id, restart_at in list(self.pending.items()):
+                    if restart_at <= monotonic():
+                        del self.pending[cluster_id]
+                        self.start(cluster_id=cluster_id)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            stop_logging()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """
+        This function waits for every running cluster to exit, then terminates the ones still running.
+
+        On Ctrl+C the clusters get the same SIGINT and close their bot, which
+        drains the write queue and closes the pool, so they get `timeout`
+        seconds to finish before being terminated. A second Ctrl+C stops
+        waiting.
+
+        :return:`None`
+        """
+        deadline = monotonic() + timeout
+        try:
+            for process in self.processes.values():
+                process.join(timeout=max(deadline - monotonic(), 0))
+        except KeyboardInterrupt:
+            pass
+        for cluster_id, process in self.processes.items():
+            if process.is_alive():
+                self.logger.warning(msg=f"Cluster {cluster_id} did not exit within {timeout:.0f}s, terminating it.")
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+        self.processes.clear()
+        self.pending.clear()
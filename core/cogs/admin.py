@@ -0,0 +1,76 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from ..bot import Bot
+from ..models import set_level, instrument, PROFILER
+from ..utils import embed_wrong
+# ------ Discord ------
+from discord import Interaction, app_commands, Embed
+from discord.ext.commands import Cog
+# ------ Typing ------
+from typing import Literal
+
+
+class Admin(Cog, name="Admin"):
+    __slots__ = "bot"
+
+    def __init__(self, bot: Bot) -> None:
+        """
+        Bot owner slash commands
+        """
+        self.bot = bot
+
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.command(name="loglevel", description="Change the bot log level, bot owner only.")
+    @app_commands.describe(level="New log level, applies until the next restart.")
+    @instrument(group="admin")
+    async def loglevel(self, interaction: Interaction,
+                       level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]) -> None:
+        # The level is process-wide, a guild administrator is not enough.
+        if await self.bot.is_owner(interaction.user):
+            set_level(level=level)
+            self.bot.logger.warning(msg=f"Log level changed to {level} by {interaction.user} ({interaction.user.id}).")
+            embed = Embed(title=":scroll: Logging", description=f"`Log level set to {level}`", colour=0x2ecc71)
+        else:
+            embed = embed_wrong(msg=f"Only the bot owner can change the log level.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.command(name="profile", description="Profile a share of the handler calls, bot owner only.")
+    @app_commands.describe(percent="Share of Claim, /vault and /create calls to profile, 0 turns it off.")
+    @instrument(group="admin")
+    async def profile(self, interaction: Interaction, percent: app_commands.Range[float, 0, 100]) -> None:
+        if await self.bot.is_owner(interaction.user):
+            PROFILER.set_rate(rate=percent / 100)
+            self.bot.logger.warning(msg=f"Profiling {percent}% of the handler calls into `{PROFILER.directory}`, "
+                                        f"set by {interaction.user} ({interaction.user.id}).")
+            embed = Embed(title=":stopwatch: Profiling",
+                          description=f"`Profiling {percent}% of the calls`", colour=0x2ecc71)
+        else:
+            embed = embed_wrong(msg=f"Only the bot owner can change profiling.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+
+
+async def setup(bot) -> None: await bot.add_cog(Admin(bot))
@@ -24,10 +24,11 @@ DEALINGS IN THE SOFTWARE.
 
 # ------ Core ------
 from ..bot import Bot
-from ..models import Database, VaultType, Errors
+from ..models import VaultType, Errors, CLAIMS, instrument, profiled
 from ..utils import embed_wrong, text_to_seconds, period
 # ------ Discord ------
-from discord import Interaction, app_commands, ui, Embed, TextStyle, ButtonStyle, Role, DiscordException
+from discord import (Interaction, InteractionType, app_commands, ui, Embed, TextStyle, ButtonStyle, Role,
+                     DiscordException)
 from discord.ext.commands import Cog
 from discord.ui import button, Button
 # ------ Typing ------
@@ -35,6 +36,11 @@ from typing import Optional
 # ------ Datetime ------
 from datetime import datetime, timedelta
 
+# Claim buttons carry their card id, `claimify:claim:<card_id>`.
+CLAIM_PREFIX: str = "claimify:claim:"
+# Cards created before that share one static custom id.
+LEGACY_CLAIM_ID: str = "Claim-KbPdSgVkYp3s6v9y$B&E"
+
 
 class Create(Cog, name="Create"):
     __slots__ = "bot"
@@ -45,77 +51,100 @@ class Create(Cog, name="Create"):
         """
         self.bot = bot
 
+    async def cog_load(self) -> None:
+        # A single view without message id answers every legacy card, whatever the number of cards.
+        self.bot.add_view(MyView())
+
     @Cog.listener()
-    async def on_guild_available(self, guild):
-        async with Database(guild_id=guild.id, owner_id=guild.owner_id, secret_key=self.bot.secret_key) as db:
-            async for card in db.get_cards(guild_id=guild.id):
-                try:
-                    self.bot.add_view(MyView(secret_key=self.bot.secret_key), message_id=card["message_id"])
-                except Exception as error:
-                    self.bot.logger.error(f"[Create] [on_guild_available] {error}")
+    async def on_interaction(self, interaction: Interaction):
+        if interaction.type is InteractionType.component:
+            custom_id: str = interaction.data.get("custom_id", "")
+            if custom_id.startswith(CLAIM_PREFIX) and custom_id[len(CLAIM_PREFIX):].isdigit():
+                await claim_card(interaction=interaction, card_id=int(custom_id[len(CLAIM_PREFIX):]))
 
     @app_commands.default_permissions(administrator=True)
     @app_commands.command(name="create", description="Create a reward card.")
-    @app_commands.describe(code="Vault unique identifier.")
-    async def slash(self, interaction: Interaction, code: str, role: Role) -> None:
+    @app_commands.describe(code="Vault unique identifier.",
+                           drop="Serve claims from memory, for cards many members claim at once.")
+    @instrument(group="create")
+    @profiled(name="Create.slash")
+    async def slash(self, interaction: Interaction, code: str, role: Role, drop: bool = False) -> None:
         code = code.lower()
-        async with Database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id,
-                            secret_key=self.bot.secret_key) as db:
-            vault: Optional[VaultType] = await db.get_vault(code=code)
+        async with self.bot.database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id) as db:
+            # Only the vault id is needed, its storage stays encrypted.
+            vault: Optional[VaultType] = await db.find_vault(code=code)
             if vault is not None:
-                modal = MyModal(vault=vault, secret_key=self.bot.secret_key, role=role)
+                modal = MyModal(vault=vault, role=role, drop=drop)
                 await interaction.response.send_modal(modal)  # type: ignore
             else:
                 embed = embed_wrong(msg=f"The code you entered does not match any existing vault.")
                 await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
 
 
+@instrument(group="create")
+@profiled(name="claim")
+async def claim_card(interaction: Interaction, card_id: Optional[int] = None) -> None:
+    """
+    Handles a click on a Claim button, `card_id` comes from the button custom id when it has one.
+    """
+    async with interaction.client.database(guild_id=interaction.guild_id,
+                                           owner_id=interaction.guild.owner_id) as db:
+        card = await db.get_card(message_id=interaction.message.id)
+        # The custom id must point at the card of the clicked message.
+        if card is not None and card_id is not None and card["id"] != card_id:
+            CLAIMS.inc("mismatch")
+            embed = embed_wrong(msg=f"Card not found.")
+        elif card is not None:
+            if card["role_id"] in [role.id for role in interaction.user.roles]:
+                try:
+                    claim = await db.claim(member_id=interaction.user.id, card=card)
+                    if type(claim) is not int:
+                        CLAIMS.inc("claimed")
+                        lines = "\n".join(claim)
+                        embed = Embed(title="Claimed!", description=f"```{lines}```", colour=0x248046)
+                    else:
+                        CLAIMS.inc("cooldown")
+                        time = f"<t:{int(datetime.timestamp(datetime.now() + timedelta(seconds=claim)))}:R>"
+                        embed = embed_wrong(msg=f"You have reached the maximum limit.\n"
+                                                f"Please try again {time}.")
+
+                except Errors.VaultNotFound:
+                    CLAIMS.inc("vault_not_found")
+                    embed = embed_wrong(msg=f"The vault is currently unreachable. Please try again later.")
+                except Errors.VaultOverLimit as error:
+                    CLAIMS.inc("over_limit")
+                    embed = embed_wrong(msg=str(error))
+            else:
+                CLAIMS.inc("missing_role")
+                embed = embed_wrong(msg=f"You do not have the required role.")
+        else:
+            CLAIMS.inc("card_not_found")
+            await interaction.message.delete()
+            embed = embed_wrong(msg=f"Card not found.")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+
+
 class MyView(ui.View):
-    __slots__ = "secret_key"
 
-    def __init__(self, secret_key: str):
+    def __init__(self, card_id: Optional[int] = None):
         super().__init__(timeout=None)
-        self.secret_key = secret_key
+        if card_id is not None:
+            self.green.custom_id = f"{CLAIM_PREFIX}{card_id}"
 
-    @button(label='Claim', style=ButtonStyle.green, custom_id="Claim-KbPdSgVkYp3s6v9y$B&E")
+    @button(label='Claim', style=ButtonStyle.green, custom_id=LEGACY_CLAIM_ID)
     async def green(self, interaction: Interaction, _: Button):
-        async with Database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id,
-                            secret_key=self.secret_key) as db:
-            card = await db.get_card(message_id=interaction.message.id)
-            if card is not None:
-                if card["role_id"] in [role.id for role in interaction.user.roles]:
-                    try:
-                        claim = await db.claim(member_id=interaction.user.id, card=card)
-                        if type(claim) is not int:
-                            lines = "\n".join(claim)
-                            embed = Embed(title="Claimed!", description=f"```{lines}```", colour=0x248046)
-                        else:
-                            time = f"<t:{int(datetime.timestamp(datetime.now() + timedelta(seconds=claim)))}:R>"
-                            embed = embed_wrong(msg=f"You have reached the maximum limit.\n"
-                                                    f"Please try again {time}.")
-
-                    except Errors.VaultNotFound:
-                        embed = embed_wrong(msg=f"The vault is currently unreachable. Please try again later.")
-                    except Errors.VaultOverLimit as error:
-                        embed = embed_wrong(msg=str(error))
-                else:
-                    embed = embed_wrong(msg=f"You do not have the required role.")
-            else:
-                await interaction.message.delete()
-                embed = embed_wrong(msg=f"Card not found.")
-
-        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+        await claim_card(interaction=interaction)
 
 
 class MyModal(ui.Modal):
-    __slots__ = ("secret_key", "vault", "role", "title_ui", "description_ui", "thumbnail_ui", "max_lines_ui",
-                 "timeout_ui")
+    __slots__ = ("vault", "role", "drop", "title_ui", "description_ui", "thumbnail_ui", "max_lines_ui", "timeout_ui")
 
-    def __init__(self, vault: VaultType, role: Role, secret_key: str):
+    def __init__(self, vault: VaultType, role: Role, drop: bool):
         super().__init__(title=f"Creating a Card")
-        self.secret_key = secret_key
         self.vault = vault
         self.role = role
+        self.drop = drop
 
         self.title_ui = ui.TextInput(label="Title", placeholder="Card title", required=True)
         self.description_ui = ui.TextInput(label="Description", placeholder="Card description",
@@ -128,12 +157,15 @@ class MyModal(ui.Modal):
         for item in [self.title_ui, self.description_ui, self.thumbnail_ui, self.max_lines_ui, self.timeout_ui]:
             self.add_item(item)
 
+    @instrument(group="create")
     async def on_submit(self, interaction: Interaction) -> None:
         try:
             max_lines = int(self.max_lines_ui.value)
             timeout = int(text_to_seconds(text=self.timeout_ui.value))
-            # Card message.
-            view = MyView(secret_key=self.secret_key)
+            # Card message, the card id is only known once stored so the button gets it right after.
+            # Clicks are handled by `Create.on_interaction`, a stopped view is never stored.
+            view = MyView()
+            view.stop()
             embed = Embed(title=str(self.title_ui.value), colour=0x248046)
             # Card description is not required.
             if self.description_ui.value is not None and str(self.description_ui.value) != "":
@@ -144,25 +176,30 @@ class MyModal(ui.Modal):
             embed.add_field(name="Requirement", value=self.role.mention, inline=True)
             embed.add_field(name="Total", value=str(max_lines), inline=True)
             try:
+                # Answered first, the card message and the database take their time.
+                await interaction.response.defer(ephemeral=True, thinking=True)  # type: ignore
                 message = await interaction.channel.send(embed=embed, view=view)
-                async with Database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id,
-                                    secret_key=self.secret_key) as db:
-                    await db.create_card(vault=self.vault,
-                                         channel_id=message.channel.id,
-                                         message_id=message.id,
-                                         role_id=self.role.id,
-                                         max_lines=max_lines,
-                                         timeout=timeout)
-                    # Response message.
-                    url = f"https://discord.com/channels/{interaction.guild_id}/{message.channel.id}/{message.id} "
-                    response_embed = Embed(title=str(self.title_ui.value),
-                                           url=url,
-                                           description=f"\nVault: `#{self.vault['code']}`"
-                                                       f"\nTimeout: `{period(delta=timedelta(seconds=timeout))}`"
-                                                       f"\n\n`Card Created Successfully!` :white_check_mark:",
-                                           colour=0x2ecc71)
-
-                    await interaction.response.send_message(embed=response_embed, ephemeral=True)  # type: ignore
+                async with interaction.client.database(guild_id=interaction.guild_id,
+                                                       owner_id=interaction.guild.owner_id) as db:
+                    card_id = await db.create_card(vault=self.vault,
+                                                   channel_id=message.channel.id,
+                                                   message_id=message.id,
+                                                   role_id=self.role.id,
+                                                   max_lines=max_lines,
+                                                   timeout=timeout,
+                                                   drop_mode=self.drop)
+                view = MyView(card_id=card_id)
+                view.stop()
+                await message.edit(view=view)
+                # Response message.
+                url = f"https://discord.com/channels/{interaction.guild_id}/{message.channel.id}/{message.id} "
+                response_embed = Embed(title=str(self.title_ui.value),
+                                       url=url,
+                                       description=f"\nVault: `#{self.vault['code']}`"
+                                                   f"\nTimeout: `{period(delta=timedelta(seconds=timeout))}`"
+                                                   f"\n\n`Card Created Successfully!` :white_check_mark:",
+                                       colour=0x2ecc71)
+                await interaction.followup.send(embed=response_embed, ephemeral=True)
             except DiscordException:
                 """
                 there is a chance that when opening modal and the channel has been removed at the same time
@@ -24,104 +24,327 @@ DEALINGS IN THE SOFTWARE.
 
 # ------ Core ------
 from ..bot import Bot
-from ..models import Database, VaultType
-from ..utils import embed_wrong
+from ..models import VaultType, Page, Errors, instrument, profiled
+from ..utils import embed_wrong, iter_lines
 # ------ Discord ------
-from discord import Interaction, app_commands, ui, Embed, TextStyle
+from discord import (Interaction, app_commands, ui, Embed, TextStyle, ButtonStyle, Attachment, File, Guild, Object,
+                     HTTPException, NotFound)
+from discord.utils import snowflake_time, utcnow
 from discord.ext.commands import Cog
 # ------ Typing ------
-from typing import Literal, Optional
+from typing import Literal, Optional, List, Set, Dict
+# ------ Asyncio ------
+from asyncio import Task, Semaphore, create_task, gather
+# ------ Datetime ------
+from datetime import timedelta
+# ------ Time ------
+from time import monotonic
+# ------ Http ------
+from aiohttp import ClientError
+# ------ Tempfile ------
+from tempfile import SpooledTemporaryFile
+
+# Exports up to this size stay in memory, larger ones are spilled to disk.
+EXPORT_SPOOL_SIZE: int = 1024 * 1024
+# Card messages deleted at once, discord.py waits out rate limits on its own.
+DELETE_CONCURRENCY: int = 4
+# Discord only bulk deletes messages younger than two weeks.
+BULK_DELETE_AGE: timedelta = timedelta(days=13, hours=23)
+# Longest page that fits the edit modal, text inputs hold 4000 characters.
+PAGE_EDIT_SIZE: int = 4000
 
 
 class Vault(Cog, name="Vault"):
-    __slots__ = "bot"
+    __slots__ = ("bot", "cleanups")
 
     def __init__(self, bot: Bot) -> None:
         """
         Vault slash command
         """
         self.bot = bot
+        # Background card deletions, referenced until they finish.
+        self.cleanups: Set[Task] = set()
 
     @app_commands.default_permissions(administrator=True)
     @app_commands.command(name="vault", description="Securely store and manage data.")
-    @app_commands.describe(code="Vault unique identifier.")
-    async def slash(self, interaction: Interaction, option: Literal["open", "create", "remove"], code: str) -> None:
+    @app_commands.describe(code="Vault unique identifier.",
+                           file="Text file with one entry per line, required to import.")
+    @instrument(group="vault")
+    @profiled(name="Vault.slash")
+    async def slash(self, interaction: Interaction, option: Literal["open", "create", "remove", "import", "export"],
+                    code: str, file: Optional[Attachment] = None) -> None:
         code = code.lower()
-        async with Database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id,
-                            secret_key=self.bot.secret_key) as db:
-            vault: Optional[VaultType] = await db.get_vault(code=code)
-            if option in ["open", "remove"] and (vault is None):
+        async with self.bot.database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id) as db:
+            # Metadata only, the storage is decrypted when a command needs it.
+            vault: Optional[VaultType] = await db.find_vault(code=code)
+            if option in ["open", "remove", "export"] and (vault is None):
                 embed = embed_wrong(msg=f"The code you entered does not match any existing vault.")
                 await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
             else:
                 # Open the vault
                 if option == "open":
-                    modal = MyModal(vault=vault, code=code, secret_key=self.bot.secret_key)
-                    await interaction.response.send_modal(modal)  # type: ignore
+                    # Only the first page is decrypted, the browser reads the others on demand.
+                    try:
+                        page = await db.read_page(vault_id=vault["id"], page=0)
+                    except Errors.VaultNotFound:
+                        embed = embed_wrong(msg=f"The code you entered does not match any existing vault.")
+                        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+                        return
+                    view = Browser(vault_id=vault["id"], code=code, page=page)
+                    await interaction.response.send_message(embed=view.embed(), view=view,  # type: ignore
+                                                            ephemeral=True)
                 # Remove the vault.
                 elif option == "remove":
                     messages = await db.remove_vault(vault_id=vault["id"])
                     embed = Embed(title=f":card_box: Vault #{code}",
                                   description="`Vault Successfully Removed` :x:", colour=0xe74c3c)
                     await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
-                    # Deleting cards.
-                    for message in messages:
-                        channel = interaction.guild.get_channel(message["channel_id"])
-                        if channel is not None:
-                            card = channel.get_partial_message(message["message_id"])
-                            if card is not None:
-                                try:
-                                    await card.delete()
-                                except Exception as error:
-                                    self.bot.logger.error(f"[Vault] {error}")
+                    # Deleting cards in the background.
+                    if len(messages) != 0:
+                        task = create_task(self.delete_cards(guild=interaction.guild, messages=messages))
+                        self.cleanups.add(task)
+                        task.add_done_callback(self.cleanups.discard)
 
                 # Create a new Vault.
                 elif option == "create":
                     if vault is None:
-                        modal = MyModal(vault=vault, code=code, secret_key=self.bot.secret_key)
+                        modal = MyModal(code=code)
                         await interaction.response.send_modal(modal)  # type: ignore
                     else:
                         embed = embed_wrong(msg=f"There is already a vault with that code.")
                         await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
 
+                # Export the vault as a text file.
+                elif option == "export":
+                    await self.export_file(interaction=interaction, db=db, vault=vault)
+
+                # Import a file into the vault, creating it if needed.
+                elif option == "import":
+                    if file is None:
+                        embed = embed_wrong(msg=f"Please attach a text file to import.")
+                        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+                    else:
+                        await self.import_file(interaction=interaction, db=db, vault=vault, code=code, file=file)
+
+    async def delete_cards(self, guild: Guild, messages: List[dict]) -> None:
+        """
+        Deletes the messages of removed cards, recent ones 100 at a time per channel.
+        """
+        semaphore = Semaphore(DELETE_CONCURRENCY)
+        channels: Dict[int, List[int]] = {}
+        for message in messages:
+            channels.setdefault(message["channel_id"], []).append(message["message_id"])
+
+        async def delete_one(channel, message_id: int) -> None:
+            async with semaphore:
+                try:
+                    await channel.get_partial_message(message_id).delete()
+                except NotFound:
+                    pass
+                except Exception as error:
+                    self.bot.logger.error(f"[Vault] {error}")
+
+        async def delete_bulk(channel, message_ids: List[int]) -> None:
+            async with semaphore:
+                try:
+                    await channel.delete_messages([Object(id=message_id) for message_id in message_ids])
+                    return
+                except HTTPException:
+                    # Bulk delete needs Manage Messages, one by one only needs the messages to be ours.
+                    pass
+            await gather(*(delete_one(channel=channel, message_id=message_id) for message_id in message_ids))
+
+        jobs = []
+        for channel_id, message_ids in channels.items():
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                continue
+            recent = [message_id for message_id in message_ids
+                      if utcnow() - snowflake_time(message_id) < BULK_DELETE_AGE]
+            if len(recent) < 2 or not hasattr(channel, "delete_messages"):
+                recent = []
+            for index in range(0, len(recent), 100):
+                jobs.append(delete_bulk(channel=channel, message_ids=recent[index:index + 100]))
+            bulk = set(recent)
+            jobs.extend(delete_one(channel=channel, message_id=message_id)
+                        for message_id in message_ids if message_id not in bulk)
+        await gather(*jobs)
+
+    async def import_file(self, interaction: Interaction, db, vault: Optional[VaultType], code: str,
+                          file: Attachment) -> None:
+        """
+        Streams an attachment into a vault, the file is never held in memory as a whole.
+        """
+        await interaction.response.defer(ephemeral=True, thinking=True)  # type: ignore
+        vault_id = vault["id"] if vault is not None else await db.create_vault(code=code, storage="")
+        last_update = monotonic()
+
+        async def progress(imported: int) -> None:
+            # Editing the response is rate limited, a few updates are enough.
+            nonlocal last_update
+            if monotonic() - last_update >= 2:
+                last_update = monotonic()
+                await interaction.edit_original_response(embed=Embed(title=f":card_box: Vault #{code}",
+                                                                     description=f"`Importing...` {imported:,} lines",
+                                                                     colour=0x2ecc71))
+
+        try:
+            imported = await db.import_lines(vault_id=vault_id, lines=iter_lines(url=file.url), progress=progress)
+            embed = Embed(title=f":card_box: Vault #{code}",
+                          description=f"`Vault Imported Successfully!` {imported:,} lines", colour=0x2ecc71)
+        except ClientError as error:
+            self.bot.logger.error(f"[Vault] [import] {error}")
+            embed = embed_wrong(msg=f"The file could not be downloaded. Please try again later.")
+        except Exception as error:
+            # The response is deferred, without an edit the user would be left waiting.
+            self.bot.logger.error(f"[Vault] [import] {error!r}")
+            embed = embed_wrong(msg=f"The file could not be imported. Please try again later.")
+        await interaction.edit_original_response(embed=embed)
+
+    async def export_file(self, interaction: Interaction, db, vault: VaultType) -> None:
+        """
+        Uploads a vault as a text file, decrypted one chunk at a time into a spooled file.
+        """
+        code = vault["code"]
+        await interaction.response.defer(ephemeral=True, thinking=True)  # type: ignore
+        with SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE) as fp:
+            try:
+                exported = await db.export_vault(vault_id=vault["id"], file=fp)
+            except Exception as error:
+                # The response is deferred, without a followup the user would be left waiting.
+                self.bot.logger.error(f"[Vault] [export] {error!r}")
+                embed = embed_wrong(msg=f"The vault could not be exported. Please try again later.")
+                await interaction.followup.send(embed=embed, ephemeral=True)
+                return
+            size = fp.tell()
+            if size > interaction.guild.filesize_limit:
+                embed = embed_wrong(msg=f"The vault is too large to be uploaded in this server.")
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            else:
+                fp.seek(0)
+                embed = Embed(title=f":card_box: Vault #{code}",
+                              description=f"`Vault Exported Successfully!` {exported:,} lines", colour=0x2ecc71)
+                await interaction.followup.send(embed=embed, file=File(fp=fp, filename=f"{code}.txt"), ephemeral=True)
+
 
 class MyModal(ui.Modal):
-    __slots__ = ("code", "secret_key", "vault", "storage_ui")
+    __slots__ = ("code", "storage_ui")
 
-    def __init__(self, vault: Optional[VaultType], code: str, secret_key: str):
+    def __init__(self, code: str):
         super().__init__(title=f"Vault #{code}")
         self.code = code
-        self.secret_key = secret_key
-        self.vault = vault
 
-        if self.vault is None:
-            storage = None
-        else:
-            storage = vault["storage"]
+        self.storage_ui = ui.TextInput(label="Storage",
+                                       style=TextStyle.long,
+                                       required=False)
+        self.add_item(self.storage_ui)
+
+    @instrument(group="vault")
+    async def on_submit(self, interaction: Interaction) -> None:
+        async with interaction.client.database(guild_id=interaction.guild_id,
+                                               owner_id=interaction.guild.owner_id) as db:
+            await db.create_vault(code=self.code, storage=str(self.storage_ui.value))
+        embed = Embed(title=f":card_box: Vault #{self.code}",
+                      description="`Vault Created Successfully!`", colour=0x2ecc71)
+        await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+
+
+class Browser(ui.View):
+    __slots__ = ("vault_id", "code", "page")
+
+    def __init__(self, vault_id: int, code: str, page: Page):
+        """
+        Pages through a vault, each button only decrypts the page it shows.
+        """
+        super().__init__(timeout=600)
+        self.vault_id = vault_id
+        self.code = code
+        self.page = page
+        self.refresh()
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.page["lines"])
+
+    def refresh(self) -> None:
+        self.previous.disabled = self.page["page"] == 0
+        self.next.disabled = self.page["page"] + 1 >= self.page["pages"]
+        self.edit.disabled = len(self.text) > PAGE_EDIT_SIZE
+
+    def embed(self) -> Embed:
+        """
+        This function renders the current page.
+
+        :return:`Embed`
+        """
+        text = self.text if len(self.text) != 0 else " "
+        if len(text) > PAGE_EDIT_SIZE:
+            text = f"{text[:PAGE_EDIT_SIZE - 1]}…"
+        embed = Embed(title=f":card_box: Vault #{self.code}", description=f"```{text}```", colour=0x2ecc71)
+        embed.set_footer(text=f"Page {self.page['page'] + 1:,}/{self.page['pages']:,} · {self.page['length']:,} lines")
+        return embed
+
+    async def show(self, interaction: Interaction, page: int) -> None:
+        """
+        This function reads a page and shows it in place of the current one.
+        """
+        try:
+            async with interaction.client.database(guild_id=interaction.guild_id,
+                                                   owner_id=interaction.guild.owner_id) as db:
+                self.page = await db.read_page(vault_id=self.vault_id, page=page)
+        except Errors.VaultNotFound:
+            self.stop()
+            embed = embed_wrong(msg=f"The code you entered does not match any existing vault.")
+            await interaction.response.edit_message(embed=embed, view=None)  # type: ignore
+            return
+        self.refresh()
+        await interaction.response.edit_message(embed=self.embed(), view=self)  # type: ignore
 
+    @ui.button(label="Previous", style=ButtonStyle.grey)
+    async def previous(self, interaction: Interaction, _: ui.Button) -> None:
+        await self.show(interaction=interaction, page=self.page["page"] - 1)
+
+    @ui.button(label="Next", style=ButtonStyle.grey)
+    async def next(self, interaction: Interaction, _: ui.Button) -> None:
+        await self.show(interaction=interaction, page=self.page["page"] + 1)
+
+    @ui.button(label="Edit", style=ButtonStyle.green)
+    async def edit(self, interaction: Interaction, _: ui.Button) -> None:
+        await interaction.response.send_modal(PageModal(browser=self))  # type: ignore
+
+
+class PageModal(ui.Modal):
+    __slots__ = ("browser", "page", "storage_ui")
+
+    def __init__(self, browser: Browser):
+        # Modal titles are limited to 45 characters.
+        super().__init__(title=f"Page {browser.page['page'] + 1:,} · Vault #{browser.code}"[:45])
+        self.browser = browser
+        # The page as it was shown, checked again before it is replaced.
+        self.page = browser.page
         self.storage_ui = ui.TextInput(label="Storage",
                                        style=TextStyle.long,
-                                       default=storage,
+                                       default=browser.text,
+                                       max_length=PAGE_EDIT_SIZE,
                                        required=False)
         self.add_item(self.storage_ui)
 
+    @instrument(group="vault")
     async def on_submit(self, interaction: Interaction) -> None:
-        if (self.vault is None) or (str(self.storage_ui.value) != self.vault["storage"]):
-            async with Database(guild_id=interaction.guild_id, owner_id=interaction.guild.owner_id,
-                                secret_key=self.secret_key) as db:
-                if self.vault is None:
-                    await db.create_vault(code=self.code, storage=str(self.storage_ui.value))
-                    embed = Embed(title=f":card_box: Vault #{self.code}",
-                                  description="`Vault Created Successfully!`", colour=0x2ecc71)
-                else:
-                    await db.update_vault(vault_id=self.vault["id"], storage=str(self.storage_ui.value))
-                    embed = Embed(title=f":card_box: Vault #{self.code}",
-                                  description="`Vault Updated Successfully!`", colour=0x2ecc71)
-                await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
-        else:
-            embed = Embed(title=f":card_box: Vault #{self.code}",
-                          description="`No Changes Made`")
+        if str(self.storage_ui.value) == "\n".join(self.page["lines"]):
+            await self.browser.show(interaction=interaction, page=self.page["page"])
+            return
+        try:
+            async with interaction.client.database(guild_id=interaction.guild_id,
+                                                   owner_id=interaction.guild.owner_id) as db:
+                await db.write_page(page=self.page, vault_id=self.browser.vault_id, storage=str(self.storage_ui.value))
+        except Errors.VaultChanged:
+            embed = embed_wrong(msg=f"The page changed while you were editing it, please try again.")
             await interaction.response.send_message(embed=embed, ephemeral=True)  # type: ignore
+            return
+        except Errors.VaultNotFound:
+            pass
+        await self.browser.show(interaction=interaction, page=self.page["page"])
 
 
 async def setup(bot) -> None: await bot.add_cog(Vault(bot))
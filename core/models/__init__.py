@@ -8,7 +8,15 @@ Modules of bot.
 :license: MIT, see LICENSE for more details.
 """
 
-from .logger import logger
-from .database import Database
-from .database import Vault as VaultType
+from .logger import logger, set_level, stop_logging
+from .pool import Pool
+from .migrations import migrate
+from .cache import CardCache, GuildRegistry, Cooldowns
+from .writer import WriteQueue
+from .drops import Drops
+from .executor import Offload
+from .metrics import REGISTRY, CLAIMS, instrument, monitor_lag, start_exporter
+from .profiler import PROFILER, profiled
+from .database import Database, warm_cards, load_cooldowns, load_guilds, flush_guilds
+from .database import Vault as VaultType, Page, PAGE_LINES
 from .errors import Errors
@@ -0,0 +1,243 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Collections ------
+from collections import OrderedDict
+# ------ Heapq ------
+from heapq import heappush, heappop
+# ------ Math ------
+from math import ceil
+# ------ Datetime ------
+from datetime import datetime
+# ------ Time ------
+from time import monotonic, time
+# ------ Typing ------
+from typing import TYPE_CHECKING, Optional, Tuple, Dict, List
+
+if TYPE_CHECKING:
+    from .database import Card, Guild
+
+
+class CardCache(object):
+    __slots__ = ("size", "ttl", "hits", "misses", "_cards")
+
+    def __init__(self, size: int = 10_000, ttl: float = 3600.0):
+        """
+        Bounded LRU of card rows keyed by message id, entries also expire after `ttl` seconds.
+
+        Cards never change once created, so entries only leave the cache
+        through eviction, expiry or an explicit `invalidate`.
+        """
+        self.size = max(size, 1)
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._cards: OrderedDict[int, Tuple[float, "Card"]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def get(self, message_id: int) -> Optional["Card"]:
+        """
+        This function returns a cached card, or None on a miss.
+
+        :return:`Card | None`
+        """
+        entry = self._cards.get(message_id)
+        if entry is None or entry[0] < monotonic():
+            if entry is not None:
+                del self._cards[message_id]
+            self.misses += 1
+            return None
+        self._cards.move_to_end(message_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, card: "Card") -> None:
+        """
+        This function caches a card, evicting the least recently used one when full.
+
+        :return:`None`
+        """
+        self._cards[card["message_id"]] = (monotonic() + self.ttl, card)
+        self._cards.move_to_end(card["message_id"])
+        while len(self._cards) > self.size:
+            self._cards.popitem(last=False)
+
+    def invalidate(self, message_id: int) -> None:
+        """
+        This function drops a card from the cache.
+
+        :return:`None`
+        """
+        self._cards.pop(message_id, None)
+
+    def clear(self) -> None:
+        self._cards.clear()
+
+    @property
+    def stats(self) -> dict:
+        """
+        Cache hit/miss counters.
+
+        :return:`dict`
+        """
+        lookups = self.hits + self.misses
+        return {"size": len(self._cards),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+class Cooldowns(object):
+    __slots__ = ("hits", "misses", "_until", "_expiries")
+
+    def __init__(self):
+        """
+        Map of (card id, member id) to the time the member may claim the card again.
+
+        It is only trusted to reject a claim, a missing or expired entry
+        falls back to the database check. Times are epoch seconds so the
+        index can be rebuilt from `claims` after a restart, entries are
+        evicted in expiry order.
+        """
+        self.hits: int = 0
+        self.misses: int = 0
+        self._until: Dict[Tuple[int, int], float] = {}
+        self._expiries: List[Tuple[float, Tuple[int, int]]] = []
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+    def remaining(self, card_id: int, member_id: int) -> int:
+        """
+        This function returns the seconds left before a member can claim the card again, 0 when unknown.
+
+        :return:`int`
+        """
+        until = self._until.get((card_id, member_id))
+        if until is None or until <= time():
+            self.misses += 1
+            return 0
+        self.hits += 1
+        return ceil(until - time())
+
+    def put(self, card_id: int, member_id: int, until: float) -> None:
+        """
+        This function records when a member may claim the card again.
+
+        :return:`None`
+        """
+        self.evict()
+        if until > time():
+            self._until[(card_id, member_id)] = until
+            heappush(self._expiries, (until, (card_id, member_id)))
+
+    def evict(self) -> None:
+        """
+        This function drops every expired entry.
+
+        :return:`None`
+        """
+        now = time()
+        while len(self._expiries) != 0 and self._expiries[0][0] <= now:
+            until, key = heappop(self._expiries)
+            # The entry may have been replaced by a later cooldown.
+            if self._until.get(key) == until:
+                del self._until[key]
+
+    @property
+    def stats(self) -> dict:
+        """
+        Index size and early rejections.
+
+        :return:`dict`
+        """
+        return {"size": len(self._until),
+                "hits": self.hits,
+                "misses": self.misses}
+
+
+class GuildRegistry(object):
+    __slots__ = ("_guilds", "_pending")
+
+    def __init__(self):
+        """
+        Process-wide map of guild rows, so no request has to SELECT or INSERT its guild.
+
+        Guilds seen for the first time are kept pending until the next
+        batched flush writes them to the database.
+        """
+        self._guilds: Dict[int, "Guild"] = {}
+        self._pending: Dict[int, "Guild"] = {}
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def add(self, guild: "Guild") -> None:
+        """
+        This function registers a guild row that already exists in the database.
+
+        :return:`None`
+        """
+        self._guilds[guild["id"]] = guild
+
+    def resolve(self, guild_id: int) -> "Guild":
+        """
+        This function returns the guild row, registering the guild if it is unknown.
+
+        :return:`Guild`
+        """
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = {"id": guild_id, "created_at": datetime.utcnow().replace(microsecond=0)}
+            self._guilds[guild_id] = guild
+            self._pending[guild_id] = guild
+        return guild
+
+    def drain(self) -> List["Guild"]:
+        """
+        This function hands over the guilds waiting to be inserted.
+
+        :return:`List[Guild]`
+        """
+        pending = list(self._pending.values())
+        self._pending.clear()
+        return pending
+
+    def requeue(self, guilds: List["Guild"]) -> None:
+        """
+        This function puts back guilds whose insert failed.
+
+        :return:`None`
+        """
+        for guild in guilds:
+            self._pending.setdefault(guild["id"], guild)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
@@ -24,16 +24,27 @@ DEALINGS IN THE SOFTWARE.
 
 # ------ Core ------
 from .errors import Errors
-from ..utils import encrypt, decrypt
+from ..utils import decrypt, derive_guild_key, seal, unseal
+from .pool import Pool
+from .cache import CardCache, GuildRegistry, Cooldowns
+from .writer import WriteQueue, Operation
+from .drops import Drops, DropVault, Line
+from .executor import Offload
+from .metrics import instrument
 # ------ sqlite ------
-from aiosqlite import connect, Connection, Cursor
+from aiosqlite import Connection
 # ------ Datetime ------
-from datetime import datetime
+from datetime import datetime, timezone
 # ------ Typing ------
-from typing import TypedDict, Optional, Iterable, List
+from typing import TypedDict, Optional, Iterable, List, Tuple, Any, AsyncIterator, Awaitable, Callable, BinaryIO
 # ------ Re ------
 from re import sub
 
+# Lines sealed together in one `vault_chunks` row, no chunk ever holds more.
+CHUNK_LINES: int = 64
+# Lines shown on one page of the vault browser.
+PAGE_LINES: int = 20
+
 
 class Guild(TypedDict):
     id: int
@@ -44,12 +55,19 @@ class Vault(TypedDict):
     id: int
     code: str
     guild_id: int
-    storage: str
     length: int
     updated_at: datetime
     created_at: datetime
 
 
+class Page(TypedDict):
+    page: int
+    pages: int
+    start: int
+    length: int
+    lines: List[str]
+
+
 class Card(TypedDict):
     id: int
     vault_id: int
@@ -60,6 +78,7 @@ class Card(TypedDict):
     max_lines: int
     timeout: int
     created_at: datetime
+    drop_mode: bool
 
 
 class Message(TypedDict):
@@ -74,235 +93,687 @@ class Claim(TypedDict):
     claim_time: datetime
 
 
-class Database(object):
-    __slots__ = ("guild_id", "owner_id", "secret_key", "guild", "connection", "cursor")
+def to_card(fetch: tuple) -> Card:
+    return {"id": fetch[0],
+            "vault_id": fetch[1],
+            "guild_id": fetch[2],
+            "channel_id": fetch[3],
+            "message_id": fetch[4],
+            "role_id": fetch[5],
+            "max_lines": fetch[6],
+            "timeout": fetch[7],
+            "created_at": fetch[8],
+            "drop_mode": bool(fetch[9])}
+
+
+def split_storage(storage: str) -> List[str]:
+    """
+    This function normalises storage into its non-empty lines.
 
-    def __init__(self, guild_id: int, owner_id: int, secret_key: str):
+    :return:`List[str]`
+    """
+    storage = sub("\n+", "\n", storage.strip())
+    return [] if len(storage) == 0 else storage.split("\n")
+
+
+def seal_chunks(key: bytes, lines: List[str]) -> List[Tuple[int, bytes]]:
+    """
+    This function seals lines `CHUNK_LINES` at a time.
+
+    :return:`List[Tuple[int, bytes]]` (count, data) of every chunk
+    """
+    return [(len(lines[index:index + CHUNK_LINES]), seal(key=key, source="\n".join(lines[index:index + CHUNK_LINES])))
+            for index in range(0, len(lines), CHUNK_LINES)]
+
+
+def seal_storage(key: bytes, storage: str) -> Tuple[int, List[Tuple[int, bytes]]]:
+    """
+    This function splits then seals a whole vault.
+
+    :return:`Tuple[int, List[Tuple[int, bytes]]]` line count and chunks
+    """
+    lines = split_storage(storage=storage)
+    return len(lines), seal_chunks(key=key, lines=lines)
+
+
+def open_storage(key: bytes, secret_key: str, owner_id: int, storage: str | bytes) -> str:
+    """
+    This function decrypt storage.
+
+    Rows written before the sealed envelope are base64 text encrypted
+    twice with AES-CBC, they are still readable and get replaced by the
+    new format on their next write.
+
+    :return:`str`
+    """
+    if isinstance(storage, bytes):
+        return unseal(key=key, source=storage)
+    dec1 = decrypt(key=secret_key, source=storage)
+    dec2 = decrypt(key=str(owner_id), source=dec1)
+    return dec2
+
+
+def open_lines(key: bytes, secret_key: str, owner_id: int, storage: str | bytes) -> List[str]:
+    return split_storage(storage=open_storage(key=key, secret_key=secret_key, owner_id=owner_id, storage=storage))
+
+
+def open_chunks(key: bytes, secret_key: str, owner_id: int, chunks: List[Tuple[int, bytes]], head: int) -> List[Line]:
+    """
+    This function decrypts sealed chunks into numbered lines, skipping the lines before `head`.
+
+    :return:`List[Line]`
+    """
+    return [(position + index, line) for position, data in chunks
+            for index, line in enumerate(open_storage(key=key, secret_key=secret_key, owner_id=owner_id,
+                                                      storage=data).split("\n"))
+            if position + index >= head]
+
+
+async def warm_cards(pool: Pool, cards: CardCache, shard_ids: Optional[Iterable[int]] = None,
+                     shard_count: Optional[int] = None) -> int:
+    """
+    This function fills the card cache with the most recent cards, in a single streaming query.
+
+    With `shard_count`, only the cards of guilds owned by `shard_ids` are
+    loaded, using Discord's `(guild_id >> 22) % shard_count` rule.
+
+    :return:`int` cached cards
+    """
+    where, parameters = "", []
+    if shard_count is not None and shard_ids is not None:
+        shard_ids = list(shard_ids)
+        where = f"WHERE (guild_id >> 22) % ? IN ({', '.join('?' * len(shard_ids))})"
+        parameters = [shard_count, *shard_ids]
+    # Oldest first, so the newest cards end up most recently used.
+    sql: str = f"""SELECT * FROM (SELECT * FROM cards {where} ORDER BY id DESC LIMIT ?) ORDER BY id;"""
+    async with pool.reader() as connection:
+        async with connection.execute(sql, (*parameters, cards.size)) as request:
+            async for fetch in request:
+                cards.put(card=to_card(fetch=fetch))
+    return len(cards)
+
+
+def cooldown_until(claim_time: datetime, timeout: int) -> float:
+    """
+    This function returns when a claim made at `claim_time` stops the member from claiming, in epoch seconds.
+
+    :return:`float`
+    """
+    return claim_time.replace(tzinfo=timezone.utc).timestamp() + timeout
+
+
+async def load_cooldowns(pool: Pool, cooldowns: Cooldowns, shard_ids: Optional[Iterable[int]] = None,
+                         shard_count: Optional[int] = None) -> int:
+    """
+    This function rebuilds the cooldown index from the claims still on cooldown, in a single streaming query.
+
+    Shards are filtered the same way as `warm_cards`.
+
+    :return:`int` indexed cooldowns
+    """
+    where, parameters = "", []
+    if shard_count is not None and shard_ids is not None:
+        shard_ids = list(shard_ids)
+        where = f"AND (claims.guild_id >> 22) % ? IN ({', '.join('?' * len(shard_ids))})"
+        parameters = [shard_count, *shard_ids]
+    sql: str = f"""SELECT claims.card_id, claims.member_id, claims.claim_time, cards.timeout FROM claims 
+    INNER JOIN cards ON cards.id = claims.card_id 
+    WHERE datetime(claims.claim_time, '+' || cards.timeout || ' seconds') > ? {where};"""
+    async with pool.reader() as connection:
+        async with connection.execute(sql, (datetime.utcnow().replace(microsecond=0), *parameters)) as request:
+            async for fetch in request:
+                cooldowns.put(card_id=fetch[0], member_id=fetch[1], until=cooldown_until(claim_time=fetch[2],
+                                                                                         timeout=fetch[3]))
+    return len(cooldowns)
+
+
+async def load_guilds(pool: Pool, guilds: GuildRegistry) -> int:
+    """
+    This function loads every known guild into the registry, in a single query.
+
+    :return:`int` loaded guilds
+    """
+    async with pool.reader() as connection:
+        async with connection.execute("""SELECT id, created_at FROM guilds;""") as request:
+            async for fetch in request:
+                guilds.add(guild={"id": int(fetch[0]), "created_at": fetch[1]})
+    return len(guilds)
+
+
+async def flush_guilds(pool: Pool, guilds: GuildRegistry) -> int:
+    """
+    This function inserts every pending guild in one transaction.
+
+    :return:`int` inserted guilds
+    """
+    pending = guilds.drain()
+    if len(pending) != 0:
+        try:
+            async with pool.writer() as connection:
+                await connection.executemany("""INSERT OR IGNORE INTO guilds(id, created_at) VALUES(?, ?);""",
+                                             ((guild["id"], guild["created_at"]) for guild in pending))
+                await connection.commit()
+        except Exception:
+            guilds.requeue(guilds=pending)
+            raise
+    return len(pending)
+
+
+class Database(object):
+    __slots__ = ("pool", "cards", "guilds", "writes", "drops", "offload", "cooldowns", "guild_id", "owner_id",
+                 "secret_key", "guild")
+
+    def __init__(self, pool: Pool, guild_id: int, owner_id: int, secret_key: str,
+                 cards: Optional[CardCache] = None, guilds: Optional[GuildRegistry] = None,
+                 writes: Optional[WriteQueue] = None, drops: Optional[Drops] = None, offload: Optional[Offload] = None,
+                 cooldowns: Optional[Cooldowns] = None):
+        self.pool = pool
+        self.offload = offload
+        self.cooldowns = cooldowns
+        self.cards = cards
+        self.guilds = guilds
+        self.writes = writes
+        self.drops = drops
         self.guild_id = guild_id
         self.owner_id = owner_id
         self.secret_key = secret_key
         self.guild: Guild = None  # type: ignore
-        self.connection: Connection | None = None
-        self.cursor: Cursor | None = None
 
     async def __aenter__(self):
-        self.connection = await connect(database="guilds.db", detect_types=3)
-        self.cursor = await self.connection.cursor()
-
-        # Guilds(*id)
-        await self.cursor.execute("""CREATE TABLE IF NOT EXISTS guilds(
-                                                            id INTEGER PRIMARY KEY,
-                                                            created_at TIMESTAMP NOT NULL);
-                                                            """)
-
-        # Vaults(*id, code, #guild_id, storage, length, updated_at, created_at)
-        await self.cursor.execute("""CREATE TABLE IF NOT EXISTS vaults(
-                                                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                            code TEXT NOT NULL,
-                                                            guild_id INTEGER NOT NULL,
-                                                            storage TEXT DEFAULT '' NOT NULL,
-                                                            length INTEGER NOT NULL,
-                                                            updated_at TIMESTAMP NOT NULL,
-                                                            created_at TIMESTAMP NOT NULL,
-                                                            FOREIGN KEY(guild_id) REFERENCES guilds(id));
-                                                            """)
-
-        # Cards(id, #vault_id, #guild_id, message_id, role_id, max_lines, timeout, created_at)
-        await self.cursor.execute("""CREATE TABLE IF NOT EXISTS cards(
-                                                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                            vault_id INTEGER NOT NULL,
-                                                            guild_id INTEGER NOT NULL,
-                                                            channel_id INTEGER NOT NULL,
-                                                            message_id INTEGER NOT NULL,
-                                                            role_id INTEGER NOT NULL,
-                                                            max_lines INTEGER NOT NULL,
-                                                            timeout INTEGER default 5 NOT NULL,
-                                                            created_at TIMESTAMP NOT NULL,
-                                                            FOREIGN KEY(vault_id) REFERENCES vaults(id),
-                                                            FOREIGN KEY(guild_id) REFERENCES guilds(id));
-                                                            """)
-
-        # Claims(*#card_id, #guild_id, member_id, claim_time)
-        await self.cursor.execute("""CREATE TABLE IF NOT EXISTS claims(
-                                                            card_id INTEGER PRIMARY KEY REFERENCES Cards(id),
-                                                            guild_id INTEGER NOT NULL,
-                                                            member_id INTEGER NOT NULL,
-                                                            claim_time TIMESTAMP NOT NULL,
-                                                            FOREIGN KEY(guild_id) REFERENCES guilds(id),
-                                                            FOREIGN KEY(card_id) REFERENCES cards(id));
-                                                            """)
-
         # Get guild
-        self.guild = await self.get_guild(guild_id=self.guild_id)
+        if self.guilds is not None:
+            self.guild = self.guilds.resolve(guild_id=self.guild_id)
+        else:
+            self.guild = await self.get_guild(guild_id=self.guild_id)
 
         return self
 
-    def encrypt_storage(self, storage: str) -> str:
-        """
-        This function encrypt storage.
+    @property
+    def key(self) -> bytes:
+        return derive_guild_key(secret_key=self.secret_key, owner_id=self.owner_id)
 
-        :return:`str`
-       """
-        faze1 = encrypt(key=str(self.owner_id), source=storage)
-        faze2 = encrypt(key=self.secret_key, source=faze1)
-        return faze2
+    async def _cpu(self, size: int, function: Callable[..., Any], *args: Any) -> Any:
+        # Large payloads are handed to the executor so the event loop keeps serving heartbeats.
+        if self.offload is None:
+            return function(*args)
+        return await self.offload.run(size, function, *args)
 
-    def decrypt_storage(self, storage: str) -> str:
-        """
-        This function decrypt storage.
+    async def _decrypt(self, storage: str | bytes) -> str:
+        return await self._cpu(len(storage), open_storage, self.key, self.secret_key, self.owner_id, storage)
 
-        :return:`str`
-       """
-        dec1 = decrypt(key=self.secret_key, source=storage)
-        dec2 = decrypt(key=str(self.owner_id), source=dec1)
-        return dec2
+    async def _write(self, operation: Operation) -> Any:
+        """
+        Runs a write operation through the group-commit queue, or on its own transaction without one.
 
+        Operations must not commit, the caller of the operation does.
+        """
+        if self.writes is not None:
+            return await self.writes.submit(operation)
+        async with self.pool.writer() as connection:
+            result = await operation(connection)
+            await connection.commit()
+            return result
+
+    @instrument(group="database")
     async def get_guild(self, guild_id: int) -> Guild:
         # -------------------------
         # Checks if the guild exists.
-        request = await self.cursor.execute("""SELECT * FROM guilds WHERE id = ?;""", (guild_id,))
-        fetch = await request.fetchone()
+        async with self.pool.reader() as connection:
+            async with connection.execute("""SELECT * FROM guilds WHERE id = ?;""", (guild_id,)) as request:
+                fetch = await request.fetchone()
         if fetch is None:
             created_at = datetime.utcnow().replace(microsecond=0)
-            await self.cursor.execute("""INSERT INTO guilds(id, created_at) VALUES(?, ?);""", (guild_id, created_at))
-            await self.connection.commit()
+            async with self.pool.writer() as connection:
+                await connection.execute("""INSERT OR IGNORE INTO guilds(id, created_at) VALUES(?, ?);""",
+                                         (guild_id, created_at))
+                await connection.commit()
             return {"id": guild_id, "created_at": created_at}
         else:
             return {"id": int(fetch[0]), "created_at": fetch[1]}
 
-    async def get_vault(self, code: str) -> Optional[Vault]:
+    async def seal_lines(self, lines: List[str]) -> List[Tuple[int, bytes]]:
         """
-        This function retrieve a vault.
+        This function seals lines `CHUNK_LINES` at a time.
 
-        :return:`dict`
-       """
-        sql: str = """SELECT * FROM vaults WHERE code = ? AND guild_id = ?;"""
-        request = await self.cursor.execute(sql, (code, self.guild["id"]))
-        fetch = await request.fetchone()
-        # Checks if the vault exists.
-        if fetch is not None:
-            try:
-                decrypt_storage = self.decrypt_storage(storage=fetch[3])
-                return {"id": fetch[0],
-                        "code": fetch[1],
-                        "guild_id": fetch[2],
-                        "storage": decrypt_storage,
-                        "length": fetch[4],
-                        "updated_at": fetch[5],
-                        "created_at": fetch[6]}
-            except ValueError:
-                await self.remove_vault(vault_id=fetch[0])
-                return None
-        else:
+        :return:`List[Tuple[int, bytes]]` (count, data) of every chunk
+        """
+        return await self._cpu(sum(len(line) for line in lines), seal_chunks, self.key, lines)
+
+    @staticmethod
+    async def _insert_chunks(connection: Connection, vault_id: int, chunks: List[Tuple[int, bytes]],
+                             start: int = 0) -> None:
+        # `position` is the number of the first line of a chunk.
+        sql: str = """INSERT INTO vault_chunks(vault_id, position, count, data) VALUES(?, ?, ?, ?);"""
+        rows, position = [], start
+        for count, data in chunks:
+            rows.append((vault_id, position, count, data))
+            position += count
+        await connection.executemany(sql, rows)
+
+    async def _insert_lines(self, connection: Connection, vault_id: int, lines: List[str], start: int = 0) -> None:
+        await self._insert_chunks(connection=connection, vault_id=vault_id, chunks=await self.seal_lines(lines=lines),
+                                  start=start)
+
+    @staticmethod
+    async def _head(connection: Connection, vault_id: int) -> int:
+        # Lines before `vaults.head` were handed out in drop mode, their chunk may still be stored.
+        async with connection.execute("""SELECT head FROM vaults WHERE id = ?;""", (vault_id,)) as request:
+            fetch = await request.fetchone()
+        return 0 if fetch is None else fetch[0]
+
+    async def _iter_lines(self, connection: Connection, vault_id: int) -> AsyncIterator[Line]:
+        head = await self._head(connection=connection, vault_id=vault_id)
+        sql: str = """SELECT position, data FROM vault_chunks WHERE vault_id = ? AND position + count > ? 
+        ORDER BY position;"""
+        async with connection.execute(sql, (vault_id, head)) as request:
+            async for position, data in request:
+                for index, line in enumerate((await self._decrypt(storage=data)).split("\n")):
+                    if position + index >= head:
+                        yield position + index, line
+
+    async def _pop_lines(self, connection: Connection, vault_id: int, amount: int) -> List[str]:
+        """
+        Removes the first `amount` lines of a vault, only the chunks holding them are decrypted.
+        """
+        head = await self._head(connection=connection, vault_id=vault_id)
+        lines: List[str] = []
+        consumed: Optional[int] = None
+        remainder: List[Line] = []
+        sql: str = """SELECT position, data FROM vault_chunks WHERE vault_id = ? AND position + count > ? 
+        ORDER BY position;"""
+        async with connection.execute(sql, (vault_id, head)) as request:
+            async for position, data in request:
+                if len(lines) >= amount:
+                    break
+                chunk = [(position + index, line)
+                         for index, line in enumerate((await self._decrypt(storage=data)).split("\n"))
+                         if position + index >= head]
+                take = amount - len(lines)
+                lines.extend(line for _, line in chunk[:take])
+                consumed = position
+                remainder = chunk[take:]
+        if consumed is not None:
+            await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ? AND position <= ?;""",
+                                     (vault_id, consumed))
+        # The last chunk was only partly claimed, seal what is left of it again.
+        if len(remainder) != 0:
+            await self._insert_lines(connection=connection, vault_id=vault_id, lines=[line for _, line in remainder],
+                                     start=remainder[0][0])
+        return lines
+
+    async def _migrate_storage(self, connection: Connection, vault_id: int) -> None:
+        """
+        Moves a vault from the legacy single encrypted blob into `vault_chunks`.
+
+        The blob is keyed by the guild owner, so this can only happen lazily
+        the first time the vault is touched, never at boot.
+        """
+        # Checked again on the writer, another interaction may have migrated it already.
+        async with connection.execute("""SELECT storage FROM vaults WHERE id = ?;""", (vault_id,)) as request:
+            fetch = await request.fetchone()
+        if fetch is None or fetch[0] == "":
+            return
+        lines = await self._cpu(len(fetch[0]), open_lines, self.key, self.secret_key, self.owner_id, fetch[0])
+        await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ?;""", (vault_id,))
+        await self._insert_lines(connection=connection, vault_id=vault_id, lines=lines)
+        await connection.execute("""UPDATE vaults SET storage = '', length = ?, head = 0 WHERE id = ?;""",
+                                 (len(lines), vault_id))
+
+    @instrument(group="database")
+    async def find_vault(self, code: str) -> Optional[Vault]:
+        """
+        This function looks a vault up by code, only its metadata is read and nothing is decrypted.
+
+        :return:`Vault`
+        """
+        sql: str = """SELECT id, code, guild_id, length, updated_at, created_at FROM vaults 
+        WHERE code = ? AND guild_id = ?;"""
+        async with self.pool.reader() as connection:
+            async with connection.execute(sql, (code, self.guild["id"])) as request:
+                fetch = await request.fetchone()
+        if fetch is None:
             return None
+        return {"id": fetch[0],
+                "code": fetch[1],
+                "guild_id": fetch[2],
+                "length": fetch[3],
+                "updated_at": fetch[4],
+                "created_at": fetch[5]}
+
+    @instrument(group="database")
+    async def export_vault(self, vault_id: int, file: BinaryIO) -> int:
+        """
+        This function writes every line of a vault to `file`, one chunk at a time.
+
+        Only a single decrypted chunk is held in memory, so the caller decides
+        where the export ends up (a spooled temporary file for uploads).
+
+        :return:`int` exported lines
+        """
+        await self._migrate_legacy(vault_id=vault_id)
+        exported: int = 0
+        async with self.pool.reader() as connection:
+            async for _, line in self._iter_lines(connection=connection, vault_id=vault_id):
+                file.write(f"{line}\n".encode("utf-8"))
+                exported += 1
+        return exported
+
+    async def _migrate_legacy(self, vault_id: int) -> None:
+        # Legacy blobs are migrated through the writer, chunked vaults are only read.
+        async with self.pool.reader() as connection:
+            async with connection.execute("""SELECT storage FROM vaults WHERE id = ?;""", (vault_id,)) as request:
+                fetch = await request.fetchone()
+        if fetch is not None and fetch[0] != "":
+            await self._write(lambda connection: self._migrate_storage(connection=connection, vault_id=vault_id))
+
+    @staticmethod
+    async def _bounds(connection: Connection, vault_id: int) -> Tuple[int, int, int]:
+        """
+        Returns (head, first, end), the live lines of a vault are the positions in [first, end).
+
+        Positions stay contiguous, so both ends are single index seeks.
+        """
+        sql: str = """SELECT head, 
+        (SELECT position FROM vault_chunks WHERE vault_id = vaults.id ORDER BY position LIMIT 1), 
+        (SELECT position + count FROM vault_chunks WHERE vault_id = vaults.id ORDER BY position DESC LIMIT 1) 
+        FROM vaults WHERE id = ?;"""
+        async with connection.execute(sql, (vault_id,)) as request:
+            fetch = await request.fetchone()
+        if fetch is None:
+            raise Errors.VaultNotFound()
+        head = fetch[0]
+        first = max(head, fetch[1] or 0)
+        return head, first, max(fetch[2] or 0, first)
+
+    async def _range(self, connection: Connection, vault_id: int, start: int,
+                     end: int) -> List[Tuple[int, int, List[str]]]:
+        """
+        Decrypts the chunks holding positions [start, end), as (position, count, lines).
+        """
+        # `position > start - CHUNK_LINES` keeps the lookup on the primary key whatever the page.
+        sql: str = """SELECT position, count, data FROM vault_chunks WHERE vault_id = ? AND position > ? 
+        AND position < ? AND position + count > ? ORDER BY position;"""
+        chunks = []
+        async with connection.execute(sql, (vault_id, start - CHUNK_LINES, end, start)) as request:
+            async for position, count, data in request:
+                chunks.append((position, count, (await self._decrypt(storage=data)).split("\n")))
+        return chunks
+
+    @instrument(group="database")
+    async def read_page(self, vault_id: int, page: int, size: int = PAGE_LINES) -> Page:
+        """
+        This function reads one page of a vault, only the chunks it overlaps are decrypted.
+
+        Pages are counted from the first line still in the vault, `page` is
+        clamped to the existing pages. A vault that can not be decrypted is
+        removed and reported as not found.
+
+        :return:`Page`
+        """
+        try:
+            await self._migrate_legacy(vault_id=vault_id)
+            async with self.pool.reader() as connection:
+                head, first, end = await self._bounds(connection=connection, vault_id=vault_id)
+                pages = max((end - first + size - 1) // size, 1)
+                page = min(max(page, 0), pages - 1)
+                start = first + page * size
+                chunks = await self._range(connection=connection, vault_id=vault_id, start=start, end=start + size)
+        except ValueError:
+            await self.remove_vault(vault_id=vault_id)
+            raise Errors.VaultNotFound()
+        lines = [line for position, _, chunk in chunks for index, line in enumerate(chunk)
+                 if start <= position + index < start + size and position + index >= head]
+        return {"page": page, "pages": pages, "start": start, "length": end - first, "lines": lines}
+
+    @instrument(group="database")
+    async def write_page(self, page: Page, vault_id: int, storage: str, size: int = PAGE_LINES) -> int:
+        """
+        This function replaces the lines of a page read with `read_page`.
+
+        Only the chunks the page overlaps are sealed again, the chunks after
+        it are moved by the change in line count without being decrypted.
+        Raises `VaultChanged` when the page no longer holds the lines read,
+        claims may have consumed them in the meantime, and `VaultNotFound`
+        like `read_page` when the vault can not be decrypted.
 
-    async def create_vault(self, code: str, storage: str) -> None:
+        :return:`int` lines in the page
+        """
+        lines = split_storage(storage=storage)
+        start, end = page["start"], page["start"] + size
+        utc = datetime.utcnow().replace(microsecond=0)
+
+        async def operation(connection: Connection) -> int:
+            head, first, _ = await self._bounds(connection=connection, vault_id=vault_id)
+            chunks = await self._range(connection=connection, vault_id=vault_id, start=start, end=end)
+            current = [line for position, _, chunk in chunks for index, line in enumerate(chunk)
+                       if start <= position + index < end and position + index >= head]
+            if start < first or current != page["lines"]:
+                raise Errors.VaultChanged()
+            if len(chunks) == 0:
+                base, old_end, prefix, suffix = start, start, [], []
+            else:
+                # Lines of the boundary chunks outside the page, handed out ones included, keep their position.
+                base, old_end = chunks[0][0], chunks[-1][0] + chunks[-1][1]
+                prefix = [line for index, line in enumerate(chunks[0][2]) if base + index < start]
+                suffix = [line for index, line in enumerate(chunks[-1][2]) if chunks[-1][0] + index >= end]
+            sealed = prefix + lines + suffix
+            shift = len(sealed) - (old_end - base)
+            await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ? AND position >= ? 
+            AND position < ?;""", (vault_id, base, old_end))
+            if shift != 0:
+                # Negated first, shifting in place could collide on the primary key.
+                await connection.execute("""UPDATE vault_chunks SET position = -position - 1 
+                WHERE vault_id = ? AND position >= ?;""", (vault_id, old_end))
+                await connection.execute("""UPDATE vault_chunks SET position = -position - 1 + ? 
+                WHERE vault_id = ? AND position < 0;""", (shift, vault_id))
+            await self._insert_lines(connection=connection, vault_id=vault_id, lines=sealed, start=base)
+            await connection.execute("""UPDATE vaults SET length = length + ?, updated_at = ? WHERE id = ?;""",
+                                     (len(lines) - len(current), utc, vault_id))
+            # Queued drop lines carry their positions, a queue loaded after this is ordered after the rewrite.
+            if self.drops is not None:
+                self.drops.discard(vault_id=vault_id)
+            return len(lines)
+
+        try:
+            return await self._write(operation)
+        except ValueError:
+            await self.remove_vault(vault_id=vault_id)
+            raise Errors.VaultNotFound()
+
+    @instrument(group="database")
+    async def create_vault(self, code: str, storage: str) -> int:
         """
         This function creates a new vault.
 
-        :return:`None`
+        :return:`int` vault id
         """
-        storage = sub("\n+", "\n", storage.strip())
+        length, chunks = await self._cpu(len(storage), seal_storage, self.key, storage)
         utc = datetime.utcnow().replace(microsecond=0)
         sql: str = """INSERT INTO vaults(code, guild_id, storage, length, updated_at, created_at) 
-        VALUES(?, ?, ?, ?, ?, ?);"""
-        await self.cursor.execute(sql, (code, self.guild["id"],
-                                        self.encrypt_storage(storage=storage),
-                                        0 if len(storage) == 0 else len(storage.split("\n")), utc, utc))
-        await self.connection.commit()
+        VALUES(?, ?, '', ?, ?, ?);"""
+        async with self.pool.writer() as connection:
+            async with connection.execute(sql, (code, self.guild["id"], length, utc, utc)) as request:
+                vault_id = request.lastrowid
+            await self._insert_chunks(connection=connection, vault_id=vault_id, chunks=chunks)
+            await connection.commit()
+        return vault_id
+
+    @instrument(group="database")
+    async def import_lines(self, vault_id: int, lines: AsyncIterator[str], batch_size: int = 4096,
+                           progress: Optional[Callable[[int], Awaitable[None]]] = None) -> int:
+        """
+        This function appends streamed lines to a vault, blank lines are skipped.
 
+        Lines are sealed in batches of `batch_size` off the writer, then each
+        batch is appended through the write queue, so claims keep flowing
+        while a large file is imported.
+
+        :return:`int` imported lines
+        """
+        imported: int = 0
+        batch: List[str] = []
+
+        async def flush() -> None:
+            nonlocal imported
+            chunks = await self.seal_lines(lines=batch)
+            utc = datetime.utcnow().replace(microsecond=0)
+
+            async def operation(connection: Connection) -> int:
+                await self._migrate_storage(connection=connection, vault_id=vault_id)
+                # New lines go after the last chunk, and never below lines already handed out in drop mode.
+                sql: str = """SELECT MAX(COALESCE(MAX(position + count), 0), (SELECT head FROM vaults WHERE id = ?)) 
+                FROM vault_chunks WHERE vault_id = ?;"""
+                async with connection.execute(sql, (vault_id, vault_id)) as request:
+                    start = (await request.fetchone())[0] or 0
+                await self._insert_chunks(connection=connection, vault_id=vault_id, chunks=chunks, start=start)
+                await connection.execute("""UPDATE vaults SET length = length + ?, updated_at = ? WHERE id = ?;""",
+                                         (len(batch), utc, vault_id))
+                return start
+
+            start = await self._write(operation)
+            # A vault held in drop mode gets the new lines at the end of its queue.
+            drop = self.drops.get(vault_id=vault_id) if self.drops is not None else None
+            if drop is not None:
+                drop.extend(lines=[(start + index, line) for index, line in enumerate(batch)])
+            elif self.drops is not None and vault_id in self.drops:
+                # Still loading, its chunks may have been read before these lines so it is loaded again.
+                self.drops.discard(vault_id=vault_id)
+            imported += len(batch)
+            batch.clear()
+            if progress is not None:
+                await progress(imported)
+
+        async for line in lines:
+            if len(line.strip()) != 0:
+                batch.append(line)
+            if len(batch) >= batch_size:
+                await flush()
+        if len(batch) != 0:
+            await flush()
+        return imported
+
+    @instrument(group="database")
     async def update_vault(self, vault_id: int, storage: str) -> None:
         """
         This function updates a vault.
 
         :return:`None`
         """
-        storage = sub("\n+", "\n", storage.strip())
+        # Sealed before queueing, the writer never waits on the cipher.
+        length, chunks = await self._cpu(len(storage), seal_storage, self.key, storage)
         utc = datetime.utcnow().replace(microsecond=0)
-        sql = """UPDATE vaults SET storage = ?, length = ?,
-         updated_at = ? WHERE id = ?;"""
-        await self.cursor.execute(sql, (self.encrypt_storage(storage=storage),
-                                        0 if len(storage) == 0 else len(storage.split("\n")), utc, vault_id))
-        await self.connection.commit()
 
+        async def operation(connection: Connection) -> None:
+            await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ?;""", (vault_id,))
+            await self._insert_chunks(connection=connection, vault_id=vault_id, chunks=chunks)
+            sql = """UPDATE vaults SET storage = '', length = ?, head = 0, updated_at = ? WHERE id = ?;"""
+            await connection.execute(sql, (length, utc, vault_id))
+            if self.drops is not None:
+                self.drops.discard(vault_id=vault_id)
+
+        await self._write(operation)
+
+    @instrument(group="database")
     async def remove_vault(self, vault_id: int) -> List[Message]:
         """
         This function delete a vault and its related cards.
 
+        Everything goes in one transaction of set-based statements, whatever
+        the number of cards.
+
         :return:`List[int]` messages
         """
-
-        messages: List[Message] = []
-
-        # Deleting the vault.
-        sql = """DELETE FROM vaults WHERE id = ?;"""
-        await self.cursor.execute(sql, (vault_id,))
-
-        sql: str = """SELECT * FROM cards WHERE vault_id = ?;"""
-        request = await self.cursor.execute(sql, (vault_id,))
-        fetch = await request.fetchall()
-        for card in fetch:
+        async def operation(connection: Connection) -> List[Message]:
+            if self.drops is not None:
+                self.drops.discard(vault_id=vault_id)
             # Deleting from the 'Claims' table where we keep track of members' claims.
-            sql = """DELETE FROM claims WHERE card_id = ?;"""
-            await self.cursor.execute(sql, (card[0],))
-            messages.append({"channel_id": card[3], "message_id": card[4]})
-        # Deleting the related cards.
-        sql = """DELETE FROM cards WHERE vault_id = ?;"""
-        await self.cursor.execute(sql, (vault_id,))
-        await self.connection.commit()
+            sql: str = """DELETE FROM claims WHERE card_id IN (SELECT id FROM cards WHERE vault_id = ?);"""
+            await connection.execute(sql, (vault_id,))
+            # Deleting the related cards, their messages are returned for cleanup.
+            # Selected first in the same transaction, RETURNING needs SQLite 3.35.
+            sql = """SELECT channel_id, message_id FROM cards WHERE vault_id = ?;"""
+            async with connection.execute(sql, (vault_id,)) as request:
+                removed = [{"channel_id": fetch[0], "message_id": fetch[1]} for fetch in await request.fetchall()]
+            await connection.execute("""DELETE FROM cards WHERE vault_id = ?;""", (vault_id,))
+            # Deleting the vault.
+            await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ?;""", (vault_id,))
+            await connection.execute("""DELETE FROM vaults WHERE id = ?;""", (vault_id,))
+            return removed
+
+        messages: List[Message] = await self._write(operation)
+        if self.cards is not None:
+            for message in messages:
+                self.cards.invalidate(message_id=message["message_id"])
         return messages
 
+    @instrument(group="database")
     async def get_card(self, message_id: int) -> Optional[Card]:
         """
         This function retrieve a card.
 
         :return:`dict`
        """
+        if self.cards is not None:
+            card = self.cards.get(message_id=message_id)
+            if card is not None:
+                return card
         sql: str = """SELECT * FROM cards WHERE message_id = ?;"""
-        request = await self.cursor.execute(sql, (message_id,))
-        fetch = await request.fetchone()
+        async with self.pool.reader() as connection:
+            async with connection.execute(sql, (message_id,)) as request:
+                fetch = await request.fetchone()
         # Checks if the card exists.
         if fetch is not None:
-            return {"id": fetch[0],
-                    "vault_id": fetch[1],
-                    "guild_id": fetch[2],
-                    "channel_id": fetch[3],
-                    "message_id": fetch[4],
-                    "role_id": fetch[5],
-                    "max_lines": fetch[6],
-                    "timeout": fetch[7],
-                    "created_at": fetch[8]}
+            card = to_card(fetch=fetch)
+            if self.cards is not None:
+                self.cards.put(card=card)
+            return card
         else:
             return None
 
-    async def create_card(self, vault: Vault, channel_id: int,
-                          message_id: int, role_id: int, max_lines: int, timeout: int) -> None:
+    @instrument(group="database")
+    async def create_card(self, vault: Vault, channel_id: int, message_id: int, role_id: int,
+                          max_lines: int, timeout: int, drop_mode: bool = False) -> int:
         """
         This function creates a new card.
 
-        :return:`None`
+        :return:`int` card id
         """
         utc = datetime.utcnow().replace(microsecond=0)
         sql: str = """INSERT INTO cards(vault_id, guild_id, channel_id, message_id, role_id, max_lines, timeout, 
-        created_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?);"""
-        await self.cursor.execute(sql, (vault["id"], self.guild["id"], channel_id,
-                                        message_id, role_id, max_lines, timeout, utc))
-        await self.connection.commit()
-
+        created_at, drop_mode) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?);"""
+        async with self.pool.writer() as connection:
+            async with connection.execute(sql, (vault["id"], self.guild["id"], channel_id,
+                                                message_id, role_id, max_lines, timeout, utc, drop_mode)) as request:
+                card_id = request.lastrowid
+            await connection.commit()
+        if self.cards is not None:
+            self.cards.put(card={"id": card_id, "vault_id": vault["id"], "guild_id": self.guild["id"],
+                                 "channel_id": channel_id, "message_id": message_id, "role_id": role_id,
+                                 "max_lines": max_lines, "timeout": timeout, "created_at": utc,
+                                 "drop_mode": drop_mode})
+        # Drops are decrypted in the background ahead of the first click.
+        if drop_mode and self.drops is not None:
+            self.drops.preload(vault_id=vault["id"], loader=self._drop_loader(vault_id=vault["id"]))
+        return card_id
+
+    @instrument(group="database")
     async def remove_card(self, card: Card) -> None:
         """
         This function delete a card and its related claims.
 
         :return:`None`
         """
-        # Deleting the card.
-        sql = """DELETE FROM cards WHERE id = ?;"""
-        await self.cursor.execute(sql, (card["id"],))
+        async with self.pool.writer() as connection:
+            # Deleting the card.
+            sql = """DELETE FROM cards WHERE id = ?;"""
+            await connection.execute(sql, (card["id"],))
 
-        # Deleting from the 'Claims' table where we keep track of members' claims.
-        sql = """DELETE FROM claims WHERE card_id = ?;"""
-        await self.cursor.execute(sql, (card["id"],))
-        await self.connection.commit()
+            # Deleting from the 'Claims' table where we keep track of members' claims.
+            sql = """DELETE FROM claims WHERE card_id = ?;"""
+            await connection.execute(sql, (card["id"],))
+            await connection.commit()
+        if self.cards is not None:
+            self.cards.invalidate(message_id=card["message_id"])
 
     async def get_cards(self, guild_id: int) -> Iterable[Card]:
         """
@@ -311,29 +782,18 @@ class Database(object):
         :return:`iter[Card]`
        """
         sql: str = """SELECT * FROM cards WHERE guild_id = ?;"""
-        request = await self.cursor.execute(sql, (guild_id,))
-        fetch = await request.fetchall()
+        async with self.pool.reader() as connection:
+            async with connection.execute(sql, (guild_id,)) as request:
+                fetch = await request.fetchall()
         # Checks if the card exists.
         for card in fetch:
-            yield {"id": card[0],
-                   "vault_id": card[1],
-                   "guild_id": card[2],
-                   "channel_id": card[3],
-                   "message_id": card[4],
-                   "role_id": card[5],
-                   "max_lines": card[6],
-                   "timeout": card[7],
-                   "created_at": card[8]}
+            yield to_card(fetch=card)
 
-    async def get_claimer(self, member_id: int, card: Card) -> Optional[Claim]:
-        """
-        This function retrieve a card claimer.
-
-        :return:`int` (seconds)
-       """
+    @staticmethod
+    async def _get_claimer(connection: Connection, member_id: int, card: Card) -> Optional[Claim]:
         sql: str = """SELECT * FROM claims WHERE member_id = ? AND card_id = ?;"""
-        request = await self.cursor.execute(sql, (member_id, card["id"]))
-        fetch = await request.fetchone()
+        async with connection.execute(sql, (member_id, card["id"])) as request:
+            fetch = await request.fetchone()
         if fetch is not None:
             return {"card_id": fetch[0],
                     "guild_id": fetch[1],
@@ -342,49 +802,189 @@ class Database(object):
         else:
             return None
 
+    @staticmethod
+    def cooldown(card: Card, claimer: Optional[Claim]) -> int:
+        """
+        This function returns the seconds left before a member can claim the card again.
+
+        :return:`int`
+        """
+        if claimer is None:
+            return 0
+        return max(card["timeout"] - int((datetime.utcnow() - claimer["claim_time"]).total_seconds()), 0)
+
+    def _remember(self, member_id: int, card: Card, claim_time: datetime) -> None:
+        """
+        Records a claim in the cooldown index, so the next clicks of the member are rejected in memory.
+        """
+        if self.cooldowns is not None and card["timeout"] > 0:
+            self.cooldowns.put(card_id=card["id"], member_id=member_id,
+                               until=cooldown_until(claim_time=claim_time, timeout=card["timeout"]))
+
+    @instrument(group="database")
     async def claim(self, member_id: int, card: Card) -> List[str] | int:
         """
         This function claim length.
 
+        Only the chunks holding the first `max_lines` lines are read and
+        decrypted, so a claim costs the same whatever the vault size.
+
+        The checks done here on a reader only reject early, the cooldown and
+        the pop are decided again inside the write operation. Operations run
+        one after the other on the writer, so concurrent claims can never
+        hand out the same line or let a member skip their cooldown.
+
+        A member still in the cooldown index is answered before any query.
+
         :return:`List[str] | int (timeout)`
        """
+        if self.cooldowns is not None:
+            tm = self.cooldowns.remaining(card_id=card["id"], member_id=member_id)
+            if tm != 0:
+                return tm
 
         # Retrieving a vault by its ID.
-        sql: str = """SELECT * FROM vaults WHERE id = ? AND guild_id = ?;"""
-        request = await self.cursor.execute(sql, (card["vault_id"], self.guild["id"]))
-        fetch = await request.fetchone()
-        if fetch is not None:
-            try:
-                decrypt_storage = self.decrypt_storage(storage=fetch[3])
-                # Checks if there is length available.
-                if fetch[4] >= card["max_lines"]:
-                    # Checks for timeout.
-                    get_claimer = await self.get_claimer(member_id=member_id, card=card)
-                    utc = datetime.utcnow().replace(microsecond=0)
-                    if get_claimer is not None:
-                        tm = max(card["timeout"] - (datetime.utcnow() - get_claimer["claim_time"]).seconds, 0)
-                        if tm != 0:
-                            return tm
-                        else:
-                            sql = """UPDATE claims SET claim_time = ? WHERE member_id = ? AND card_id = ? 
-                            AND guild_id = ?;"""
-                    else:
-                        sql = """INSERT INTO claims(claim_time, member_id, card_id, guild_id) VALUES(?, ?, ?, ?);"""
-
-                    storage = sub("\n+", "\n", str(decrypt_storage).strip()).split("\n")
-                    claim = storage[:card["max_lines"]]
-                    # Updating vault
-                    await self.update_vault(vault_id=fetch[0], storage="\n".join(storage[card["max_lines"]:]))
-                    # Updating timeout.
-                    await self.cursor.execute(sql, (utc, member_id, card["id"], self.guild["id"]))
-                    await self.connection.commit()
-                    return claim
-                else:
-                    raise Errors.VaultOverLimit(code=fetch[1])
-            except ValueError:
-                raise Errors.VaultNotFound()
-        else:
+        sql: str = """SELECT id, code, storage, length FROM vaults WHERE id = ? AND guild_id = ?;"""
+        async with self.pool.reader() as connection:
+            async with connection.execute(sql, (card["vault_id"], self.guild["id"])) as request:
+                fetch = await request.fetchone()
+            if fetch is not None:
+                # Checks for timeout.
+                get_claimer = await self._get_claimer(connection=connection, member_id=member_id, card=card)
+        if fetch is None:
             raise Errors.VaultNotFound()
+        # Checks if there is length available, legacy vaults are counted once migrated.
+        if fetch[2] == "" and fetch[3] < card["max_lines"]:
+            raise Errors.VaultOverLimit(code=fetch[1])
+        tm = self.cooldown(card=card, claimer=get_claimer)
+        if tm != 0:
+            self._remember(member_id=member_id, card=card, claim_time=get_claimer["claim_time"])
+            return tm
+        # Once a vault is held in memory every claim on it must go through the queue.
+        if self.drops is not None and fetch[2] == "" and (card["drop_mode"] or fetch[0] in self.drops):
+            return await self._claim_drop(member_id=member_id, card=card, code=fetch[1])
+        utc = datetime.utcnow().replace(microsecond=0)
+
+        async def operation(connection: Connection) -> Optional[List[str] | int]:
+            # Loaded into memory since the early check, the drop queue owns the lines now.
+            if self.drops is not None and fetch[0] in self.drops:
+                return None
+            if fetch[2] != "":
+                await self._migrate_storage(connection=connection, vault_id=fetch[0])
+            # A claim of the same member may have been committed since the early check.
+            timeout = self.cooldown(card=card, claimer=await self._get_claimer(connection=connection,
+                                                                               member_id=member_id, card=card))
+            if timeout != 0:
+                return timeout
+            lines = await self._pop_lines(connection=connection, vault_id=fetch[0],
+                                          amount=max(card["max_lines"], 0))
+            if len(lines) < card["max_lines"]:
+                # Emptied by claims queued before this one, the savepoint undoes the pop.
+                raise Errors.VaultOverLimit(code=fetch[1])
+            # Updating vault
+            await connection.execute("""UPDATE vaults SET length = length - ?, updated_at = ? WHERE id = ?;""",
+                                     (len(lines), utc, fetch[0]))
+            # Updating timeout.
+            await connection.execute("""INSERT INTO claims(claim_time, member_id, card_id, guild_id) 
+            VALUES(?, ?, ?, ?) ON CONFLICT(member_id, card_id) DO UPDATE SET claim_time = excluded.claim_time;""",
+                                     (utc, member_id, card["id"], self.guild["id"]))
+            return lines
+
+        try:
+            result = await self._write(operation)
+        except ValueError:
+            raise Errors.VaultNotFound()
+        if result is None:
+            return await self._claim_drop(member_id=member_id, card=card, code=fetch[1])
+        if not isinstance(result, int):
+            self._remember(member_id=member_id, card=card, claim_time=utc)
+        return result
+
+    @instrument(group="database")
+    async def load_drop(self, vault_id: int) -> DropVault:
+        """
+        This function decrypts a vault once into the in-memory drop queue.
+
+        :return:`DropVault`
+        """
+        return await self.drops.load(vault_id=vault_id, loader=self._drop_loader(vault_id=vault_id))
+
+    def _drop_loader(self, vault_id: int) -> Callable[[], Awaitable[List[Line]]]:
+        """
+        Only `vaults.head` and the sealed chunks after it are read on the
+        writer, through the write queue, so the queue starts after every
+        claim and rewrite queued before it. The chunks are decrypted once
+        the writer is released, claims on the vault wait for the load and
+        a rewrite meanwhile makes it start over.
+        """
+        async def operation(connection: Connection) -> Tuple[int, List[Tuple[int, bytes]]]:
+            await self._migrate_storage(connection=connection, vault_id=vault_id)
+            head = await self._head(connection=connection, vault_id=vault_id)
+            sql: str = """SELECT position, data FROM vault_chunks WHERE vault_id = ? AND position + count > ? 
+            ORDER BY position;"""
+            async with connection.execute(sql, (vault_id, head)) as request:
+                return head, list(await request.fetchall())
+
+        async def loader() -> List[Line]:
+            head, chunks = await self._write(operation)
+            return await self._cpu(sum(len(data) for _, data in chunks), open_chunks, self.key, self.secret_key,
+                                   self.owner_id, chunks, head)
+
+        return loader
+
+    async def _claim_drop(self, member_id: int, card: Card, code: str) -> List[str] | int:
+        """
+        Claims from a vault held in memory, no chunk is decrypted or sealed on this path.
+
+        The write operation checks the cooldown, takes the lines starting at
+        `vaults.head` and moves `head` past them, so handed out lines always
+        form a prefix of the queue in commit order. Lines only leave the
+        queue once that commit is durable: a claim on cooldown, a failing
+        operation or a replayed batch has nothing to give back, and the
+        queue rebuilt from `head` after a restart holds every line that was
+        not handed out.
+        """
+        try:
+            drop = await self.load_drop(vault_id=card["vault_id"])
+        except ValueError:
+            raise Errors.VaultNotFound()
+        amount = max(card["max_lines"], 0)
+        if len(drop.lines) < amount:
+            raise Errors.VaultOverLimit(code=code)
+        utc = datetime.utcnow().replace(microsecond=0)
+
+        async def operation(connection: Connection) -> List[Line] | int:
+            if not drop.valid:
+                # The vault was rewritten since it was loaded.
+                raise Errors.VaultNotFound()
+            timeout = self.cooldown(card=card, claimer=await self._get_claimer(connection=connection,
+                                                                               member_id=member_id, card=card))
+            if timeout != 0:
+                return timeout
+            lines = drop.take(head=await self._head(connection=connection, vault_id=card["vault_id"]), amount=amount)
+            if len(lines) < amount:
+                # Emptied by claims queued before this one.
+                raise Errors.VaultOverLimit(code=code)
+            if len(lines) != 0:
+                head = lines[-1][0] + 1
+                await connection.execute("""UPDATE vaults SET head = MAX(head, ?), length = length - ?, 
+                updated_at = ? WHERE id = ?;""", (head, len(lines), utc, card["vault_id"]))
+                # Chunks made only of handed out lines.
+                await connection.execute("""DELETE FROM vault_chunks WHERE vault_id = ? AND position < ? 
+                AND position + count <= ?;""", (card["vault_id"], head, head))
+            await connection.execute("""INSERT INTO claims(claim_time, member_id, card_id, guild_id) 
+            VALUES(?, ?, ?, ?) ON CONFLICT(member_id, card_id) DO UPDATE SET claim_time = excluded.claim_time;""",
+                                     (utc, member_id, card["id"], self.guild["id"]))
+            return lines
+
+        result = await self._write(operation)
+        if isinstance(result, int):
+            return result
+        if len(result) != 0:
+            drop.trim(head=result[-1][0] + 1)
+        drop.served += len(result)
+        self._remember(member_id=member_id, card=card, claim_time=utc)
+        return [line for _, line in result]
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.connection.close()
+        pass
@@ -0,0 +1,176 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Asyncio ------
+from asyncio import Lock, Task, create_task, gather
+# ------ Collections ------
+from collections import deque
+# ------ Typing ------
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+# (line number, line)
+Line = Tuple[int, str]
+
+
+class DropVault(object):
+    __slots__ = ("vault_id", "lines", "valid", "served", "tail")
+
+    def __init__(self, vault_id: int, lines: Iterable[Line]):
+        """
+        Decrypted lines of a vault in drop mode, claims take them from the left.
+        """
+        self.vault_id = vault_id
+        self.lines: Deque[Line] = deque(lines)
+        self.valid: bool = True
+        self.served: int = 0
+        # Number after the last line this queue has ever held.
+        self.tail: int = self.lines[-1][0] + 1 if len(self.lines) != 0 else 0
+
+    def take(self, head: int, amount: int) -> List[Line]:
+        """
+        This function returns the next `amount` lines from `head` on, or none if there are not enough.
+
+        Lines stay queued until `trim`, so a claim that never commits has nothing to give back.
+
+        :return:`List[Line]`
+        """
+        lines: List[Line] = []
+        for line in self.lines:
+            if len(lines) == amount:
+                break
+            # Lines before `head` were taken by claims that are not trimmed yet.
+            if line[0] >= head:
+                lines.append(line)
+        return lines if len(lines) == amount else []
+
+    def trim(self, head: int) -> None:
+        """
+        This function drops the lines before a committed `head`.
+
+        :return:`None`
+        """
+        while len(self.lines) != 0 and self.lines[0][0] < head:
+            self.lines.popleft()
+
+    def extend(self, lines: List[Line]) -> None:
+        """
+        This function appends lines added to the vault, skipping any the queue already holds.
+
+        :return:`None`
+        """
+        if self.valid:
+            self.lines.extend(line for line in lines if line[0] >= self.tail)
+            self.tail = max(self.tail, lines[-1][0] + 1) if len(lines) != 0 else self.tail
+
+
+class Drops(object):
+    __slots__ = ("_vaults", "_locks", "_loading", "_generations", "_preloads", "loads")
+
+    def __init__(self):
+        """
+        Vaults decrypted once into memory for cards in drop mode.
+
+        The database stays the source of truth, a vault is only kept here
+        while nothing else rewrites its lines.
+        """
+        self._vaults: Dict[int, DropVault] = {}
+        self._locks: Dict[int, Lock] = {}
+        self._loading: Set[int] = set()
+        # Bumped on every discard, a load that raced a rewrite is done again.
+        self._generations: Dict[int, int] = {}
+        self._preloads: Set[Task] = set()
+        self.loads: int = 0
+
+    def __contains__(self, vault_id: int) -> bool:
+        # A vault being loaded counts, its queue may already hold lines a regular claim would pop.
+        return vault_id in self._vaults or vault_id in self._loading
+
+    def get(self, vault_id: int) -> Optional[DropVault]:
+        return self._vaults.get(vault_id)
+
+    async def load(self, vault_id: int, loader: Callable[[], Awaitable[Iterable[Line]]]) -> DropVault:
+        """
+        This function returns the vault queue, decrypting the vault only once even under concurrent clicks.
+
+        :return:`DropVault`
+        """
+        lock = self._locks.setdefault(vault_id, Lock())
+        async with lock:
+            drop = self._vaults.get(vault_id)
+            while drop is None:
+                generation = self._generations.get(vault_id, 0)
+                self._loading.add(vault_id)
+                try:
+                    lines = await loader()
+                finally:
+                    self._loading.discard(vault_id)
+                if self._generations.get(vault_id, 0) == generation:
+                    drop = DropVault(vault_id=vault_id, lines=lines)
+                    self._vaults[vault_id] = drop
+                    self.loads += 1
+            return drop
+
+    def preload(self, vault_id: int, loader: Callable[[], Awaitable[Iterable[Line]]]) -> None:
+        """
+        This function loads a vault in the background, a click meanwhile waits for it instead of loading again.
+
+        :return:`None`
+        """
+        task = create_task(self.load(vault_id=vault_id, loader=loader), name=f"claimify:drop-load:{vault_id}")
+        self._preloads.add(task)
+        task.add_done_callback(self._preloaded)
+
+    def _preloaded(self, task: Task) -> None:
+        self._preloads.discard(task)
+        # A failed preload is not reported here, the first click loads the vault again and answers the error.
+        if not task.cancelled():
+            task.exception()
+
+    async def close(self) -> None:
+        """
+        This function cancels the preloads still running.
+
+        :return:`None`
+        """
+        for task in self._preloads:
+            task.cancel()
+        await gather(*self._preloads, return_exceptions=True)
+
+    def discard(self, vault_id: int) -> None:
+        """
+        This function forgets a vault whose lines are being rewritten.
+
+        :return:`None`
+        """
+        self._generations[vault_id] = self._generations.get(vault_id, 0) + 1
+        drop = self._vaults.pop(vault_id, None)
+        if drop is not None:
+            drop.valid = False
+
+    @property
+    def stats(self) -> dict:
+        return {"vaults": len(self._vaults),
+                "loads": self.loads,
+                "queued": sum(len(drop.lines) for drop in self._vaults.values()),
+                "served": sum(drop.served for drop in self._vaults.values())}
@@ -34,6 +34,16 @@ class Errors:
         def __init__(self, message="vault does not exist."):
             super().__init__(message)
 
+    class VaultChanged(Exception):
+        """Exception raised cause the vault changed since it was read.
+
+            Attributes:
+                message -- explanation of the error
+            """
+
+        def __init__(self, message="vault changed since it was read."):
+            super().__init__(message)
+
     class VaultOverLimit(Exception):
         """Exception raised cause vault over limit.
 
@@ -0,0 +1,98 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Asyncio ------
+from asyncio import get_running_loop
+# ------ Concurrent ------
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+# ------ Typing ------
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Offload(object):
+    __slots__ = ("kind", "threshold", "executor", "inline", "offloaded", "offloaded_bytes")
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None, threshold: int = 64 * 1024):
+        """
+        Runs CPU-bound vault work (AES, splitting, joining) off the event loop.
+
+        `kind` is "thread" (pycryptodome releases the GIL while encrypting),
+        "process" for pure Python work to scale past the GIL, or "none".
+        Payloads under `threshold` bytes run inline, handing them to a
+        worker would cost more than the work itself.
+
+        Functions sent to a process pool must be importable module functions.
+        """
+        if kind not in ("none", "thread", "process"):
+            raise ValueError(f"Unknown executor kind {kind!r}, expected none, thread or process.")
+        self.kind = kind
+        self.threshold = threshold
+        self.executor: Optional[Executor] = None
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="claimify-crypto")
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Metrics.
+        self.inline: int = 0
+        self.offloaded: int = 0
+        self.offloaded_bytes: int = 0
+
+    async def run(self, size: int, function: Callable[..., T], *args: Any) -> T:
+        """
+        This function calls `function(*args)`, in the executor when `size` reaches the threshold.
+
+        :return:`T`
+        """
+        if self.executor is None or size < self.threshold:
+            self.inline += 1
+            return function(*args)
+        self.offloaded += 1
+        self.offloaded_bytes += size
+        return await get_running_loop().run_in_executor(self.executor, partial(function, *args))
+
+    def close(self) -> None:
+        """
+        This function waits for running jobs and shuts the executor down.
+
+        :return:`None`
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    @property
+    def stats(self) -> dict:
+        """
+        Inline and offloaded call counters.
+
+        :return:`dict`
+        """
+        return {"kind": self.kind,
+                "threshold": self.threshold,
+                "inline": self.inline,
+                "offloaded": self.offloaded,
+                "offloaded_bytes": self.offloaded_bytes}
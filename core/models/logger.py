@@ -23,41 +23,104 @@ DEALINGS IN THE SOFTWARE.
 """
 
 # ------ Logging ------
-from logging import Logger, getLogger, FileHandler, StreamHandler, Formatter
+from logging import Logger, Filter, getLogger, getLevelName, StreamHandler, Formatter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+# ------ Queue ------
+from queue import SimpleQueue
+# ------ Typing ------
+from typing import Optional
+import os
 
+# Writes every record off the event loop, see `logger`.
+_listener: Optional[QueueListener] = None
 
-def logger(level: int = 10) -> Logger:
+
+def parse_level(level: int | str) -> int:
+    """
+    This function turns a level name such as "INFO" or a number into a logging level.
+
+    :return:`int`
+    """
+    if isinstance(level, int) or level.isdigit():
+        return int(level)
+    value = getLevelName(level.upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level {level!r}.")
+    return value
+
+
+def set_level(level: int | str) -> int:
+    """
+    This function changes the level of the bot and discord loggers at runtime.
+
+    :return:`int` the new level
+    """
+    level = parse_level(level=level)
+    getLogger("discord").setLevel(level)
+    getLogger("claimify").setLevel(level)
+    return level
+
+
+def stop_logging() -> None:
+    """
+    This function writes the records still queued and stops the logging thread.
+
+    :return:`None`
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def logger(level: Optional[int | str] = None, filename: str = "debug.log") -> Logger:
     """
     This function will report events that occur during normal operation of a program.
 
-    :param level:`int`
+    Loggers only put records on a queue, a `QueueListener` thread writes
+    them to the console and to a size-rotated file, so no disk I/O happens
+    on the event loop.
+
+    :param level:`int | str` defaults to the `LOG_LEVEL` env (DEBUG when unset)
         CRITICAL: 50
         ERROR 40
         WARNING	30
         INFO: 20
         DEBUG: 10
         NOTSET: 0
+    :param filename:`str` discord log file, one per process when clustered.
 
     :return:`logging.Logger`
     """
+    global _listener
+    stop_logging()
+    queue = SimpleQueue()
+
     # ----- Discord -----
     discord = getLogger("discord")
-    discord.setLevel(level)
-    # create file handler which logs even debug messages
-    fh = FileHandler("debug.log", "w", encoding="utf-8")
-    fh.setLevel(level)
+    # create file handler which logs even debug messages, rotated by size
+    fh = RotatingFileHandler(filename, maxBytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+                             backupCount=int(os.getenv("LOG_BACKUPS", 5)), encoding="utf-8")
+    fh.addFilter(Filter("discord"))
     # create formatter and add it to the handlers
     fh.setFormatter(Formatter("[%(asctime)s] [%(levelname)s] %(message)s"))
-    discord.addHandler(fh)
 
     # ----- Bot -----
     _logger = getLogger("claimify")
-    _logger.setLevel(level)
-    # create console handler with a higher log level
+    # create console handler
     ch = StreamHandler()
-    ch.setLevel(level)
+    ch.addFilter(Filter("claimify"))
     # create formatter and add it to the handlers
     ch.setFormatter(Formatter("[%(levelname)s] %(message)s"))
-    # add the handlers to logger
-    _logger.addHandler(ch)
+
+    # both loggers only enqueue, the listener thread routes records to their handler
+    for _log in (discord, _logger):
+        for handler in [handler for handler in _log.handlers if isinstance(handler, QueueHandler)]:
+            _log.removeHandler(handler)
+        _log.addHandler(QueueHandler(queue))
+    set_level(level=level if level is not None else os.getenv("LOG_LEVEL", "DEBUG"))
+    _listener = QueueListener(queue, fh, ch, respect_handler_level=True)
+    _listener.start()
     return _logger
@@ -0,0 +1,262 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Asyncio ------
+from asyncio import sleep
+# ------ Http ------
+from aiohttp import web
+# ------ Functools ------
+from functools import wraps
+# ------ Time ------
+from time import perf_counter
+# ------ Typing ------
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+Labels = Tuple[str, ...]
+
+# Latency buckets in seconds, from a cached card lookup to a large vault rewrite.
+BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _value(value: float) -> str:
+    # Prometheus spells the special floats its own way.
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _labels(names: Labels, values: Labels, le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(object):
+    __slots__ = ("name", "help", "labels", "values")
+
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        self.values[values] = self.values.get(values, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, values)} {_value(value)}"
+
+
+class Histogram(object):
+    __slots__ = ("name", "help", "labels", "buckets", "values")
+
+    def __init__(self, name: str, help: str, labels: Labels = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: bucket counts (last one is +Inf), sum.
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        entry = self.values.get(values)
+        if entry is None:
+            entry = self.values[values] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+        total[0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, values, le=str(bound))} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_labels(self.labels, values, le='+Inf')} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {_value(total[0])}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+
+
+class Gauge(object):
+    __slots__ = ("name", "help", "labels", "values", "function")
+
+    def __init__(self, name: str, help: str, labels: Labels = (),
+                 function: Optional[Callable[[], Dict[Labels, float]]] = None):
+        """
+        A value that goes up and down, set directly or read from `function` at scrape time.
+        """
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Labels, float] = {}
+        self.function = function
+
+    def set(self, value: float, *values: str) -> None:
+        self.values[values] = value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        values = self.values if self.function is None else self.function()
+        for labels, value in values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {_value(value)}"
+
+
+def flatten(stats: dict, prefix: str = "") -> Dict[Labels, float]:
+    """
+    This function turns a nested `stats` dict into gauge values labelled by their dotted key.
+
+    :return:`Dict[Labels, float]`
+    """
+    values: Dict[Labels, float] = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            values.update(flatten(stats=value, prefix=f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            values[(f"{prefix}{key}",)] = float(value)
+    return values
+
+
+class Registry(object):
+    __slots__ = ("_metrics",)
+
+    def __init__(self):
+        """
+        Process-wide set of metrics, rendered in the Prometheus text format.
+        """
+        self._metrics: Dict[str, Counter | Histogram | Gauge] = {}
+
+    def _add(self, metric: Any) -> Any:
+        # Registering twice returns the first metric, modules can be reloaded.
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Labels = ()) -> Counter:
+        return self._add(Counter(name=name, help=help, labels=labels))
+
+    def histogram(self, name: str, help: str, labels: Labels = ()) -> Histogram:
+        return self._add(Histogram(name=name, help=help, labels=labels))
+
+    def gauge(self, name: str, help: str, labels: Labels = (),
+              function: Optional[Callable[[], Dict[Labels, float]]] = None) -> Gauge:
+        metric = self._add(Gauge(name=name, help=help, labels=labels))
+        # Replaced on every call, a new bot instance reports its own components.
+        metric.function = function
+        return metric
+
+    def stats(self, name: str, help: str, function: Callable[[], dict]) -> Gauge:
+        """
+        This function exposes a component `stats` dict, one gauge value per numeric entry.
+
+        :return:`Gauge`
+        """
+        return self.gauge(name=name, help=help, labels=("stat",), function=lambda: flatten(stats=function()))
+
+    def render(self) -> str:
+        """
+        This function renders every metric in the Prometheus text format.
+
+        :return:`str`
+        """
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+CALLS = REGISTRY.histogram(name="claimify_call_seconds", help="Duration of database calls and interaction handlers.",
+                           labels=("group", "name"))
+ERRORS = REGISTRY.counter(name="claimify_call_errors_total", help="Database calls and handlers that raised.",
+                          labels=("group", "name", "error"))
+CLAIMS = REGISTRY.counter(name="claimify_claims_total", help="Claim button clicks by outcome.", labels=("outcome",))
+LOOP_LAG = REGISTRY.histogram(name="claimify_loop_lag_seconds", help="How late the event loop runs a timer.")
+
+
+def instrument(group: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    This function decorates a coroutine function to time every call and count its errors.
+
+    :return:`Callable`
+    """
+    def decorator(function: Callable[..., T]) -> Callable[..., T]:
+        name = function.__name__
+
+        @wraps(function)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception as error:
+                ERRORS.inc(group, name, type(error).__name__)
+                raise
+            finally:
+                CALLS.observe(perf_counter() - started, group, name)
+        return wrapper
+    return decorator
+
+
+async def monitor_lag(interval: float = 0.5) -> None:
+    """
+    This function records event loop lag until it is cancelled.
+
+    :return:`None`
+    """
+    while True:
+        started = perf_counter()
+        await sleep(interval)
+        LOOP_LAG.observe(max(perf_counter() - started - interval, 0.0))
+
+
+async def start_exporter(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> web.AppRunner:
+    """
+    This function serves `/metrics` in the Prometheus text format, on localhost unless told otherwise.
+
+    :return:`web.AppRunner` to clean up on shutdown
+    """
+    async def handler(_: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
@@ -0,0 +1,161 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ sqlite ------
+from aiosqlite import Connection, IntegrityError
+# ------ Datetime ------
+from datetime import datetime
+# ------ Typing ------
+from typing import List, NamedTuple
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    script: str
+
+
+# Ordered schema changes, never edit a released migration, append a new one instead.
+MIGRATIONS: List[Migration] = [
+    Migration(version=1, description="initial schema", script="""
+        -- Guilds(*id)
+        CREATE TABLE IF NOT EXISTS guilds(
+            id INTEGER PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL);
+
+        -- Vaults(*id, code, #guild_id, storage, length, updated_at, created_at)
+        CREATE TABLE IF NOT EXISTS vaults(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            storage TEXT DEFAULT '' NOT NULL,
+            length INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            FOREIGN KEY(guild_id) REFERENCES guilds(id));
+
+        -- Cards(id, #vault_id, #guild_id, message_id, role_id, max_lines, timeout, created_at)
+        CREATE TABLE IF NOT EXISTS cards(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            max_lines INTEGER NOT NULL,
+            timeout INTEGER default 5 NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            FOREIGN KEY(vault_id) REFERENCES vaults(id),
+            FOREIGN KEY(guild_id) REFERENCES guilds(id));
+
+        -- Claims(*#card_id, #guild_id, member_id, claim_time)
+        CREATE TABLE IF NOT EXISTS claims(
+            card_id INTEGER PRIMARY KEY REFERENCES Cards(id),
+            guild_id INTEGER NOT NULL,
+            member_id INTEGER NOT NULL,
+            claim_time TIMESTAMP NOT NULL,
+            FOREIGN KEY(guild_id) REFERENCES guilds(id),
+            FOREIGN KEY(card_id) REFERENCES cards(id));
+        """),
+    Migration(version=2, description="lookup indexes", script="""
+        CREATE INDEX IF NOT EXISTS cards_message_id ON cards(message_id);
+        CREATE INDEX IF NOT EXISTS cards_vault_id ON cards(vault_id);
+        CREATE INDEX IF NOT EXISTS cards_guild_id ON cards(guild_id);
+        CREATE INDEX IF NOT EXISTS vaults_code_guild_id ON vaults(code, guild_id);
+        """),
+    # `card_id` alone was the primary key, so a card could only ever be claimed by one member.
+    Migration(version=3, description="claims keyed by (member_id, card_id)", script="""
+        CREATE TABLE claims_new(
+            card_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            member_id INTEGER NOT NULL,
+            claim_time TIMESTAMP NOT NULL,
+            PRIMARY KEY(member_id, card_id),
+            FOREIGN KEY(guild_id) REFERENCES guilds(id),
+            FOREIGN KEY(card_id) REFERENCES cards(id));
+        INSERT INTO claims_new(card_id, guild_id, member_id, claim_time)
+            SELECT card_id, guild_id, member_id, claim_time FROM claims;
+        DROP TABLE claims;
+        ALTER TABLE claims_new RENAME TO claims;
+        CREATE INDEX IF NOT EXISTS claims_card_id ON claims(card_id);
+        """),
+    # Every line is encrypted on its own so a claim only touches the rows it hands out.
+    # Legacy `vaults.storage` blobs are moved here lazily, see `Database._migrate_storage`.
+    Migration(version=4, description="line-granular vault storage", script="""
+        CREATE TABLE vault_lines(
+            vault_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            line TEXT NOT NULL,
+            PRIMARY KEY(vault_id, position),
+            FOREIGN KEY(vault_id) REFERENCES vaults(id)) WITHOUT ROWID;
+        """),
+    # Sealing one line at a time made AES-GCM setup dominate, lines are now sealed in chunks.
+    # Rows written by version 4 are single-line chunks in the legacy format and stay readable.
+    Migration(version=5, description="chunked vault storage", script="""
+        ALTER TABLE vault_lines RENAME TO vault_chunks;
+        ALTER TABLE vault_chunks RENAME COLUMN line TO data;
+        ALTER TABLE vault_chunks ADD COLUMN count INTEGER DEFAULT 1 NOT NULL;
+        """),
+    # Drop mode serves claims from memory and only persists how far into the vault it got.
+    Migration(version=6, description="drop mode", script="""
+        ALTER TABLE cards ADD COLUMN drop_mode INTEGER DEFAULT 0 NOT NULL;
+        ALTER TABLE vaults ADD COLUMN head INTEGER DEFAULT 0 NOT NULL;
+        """),
+]
+
+
+async def migrate(connection: Connection) -> int:
+    """
+    This function applies every pending migration, each one in its own transaction.
+
+    :return:`int` schema version
+    """
+    await connection.execute("""CREATE TABLE IF NOT EXISTS schema_version(
+                                    version INTEGER PRIMARY KEY,
+                                    description TEXT NOT NULL,
+                                    applied_at TIMESTAMP NOT NULL);""")
+    await connection.commit()
+    async with connection.execute("""SELECT MAX(version) FROM schema_version;""") as request:
+        fetch = await request.fetchone()
+    current: int = fetch[0] or 0
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        utc = datetime.utcnow().replace(microsecond=0)
+        try:
+            # The version row is claimed first, so when several processes start
+            # together only one of them runs the script, the others wait then skip it.
+            await connection.executescript(f"""BEGIN IMMEDIATE;
+                INSERT INTO schema_version(version, description, applied_at)
+                VALUES({migration.version}, '{migration.description}', '{utc}');
+                {migration.script}
+                COMMIT;""")
+        except IntegrityError:
+            await connection.rollback()
+        except Exception:
+            await connection.rollback()
+            raise
+        current = migration.version
+    return current
@@ -0,0 +1,147 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ sqlite ------
+from aiosqlite import connect, Connection
+# ------ Asyncio ------
+from asyncio import Queue, Lock
+from contextlib import asynccontextmanager
+# ------ Time ------
+from time import perf_counter
+# ------ Typing ------
+from typing import TypedDict, AsyncIterator, Optional, List
+
+
+class WaitStats(TypedDict):
+    acquired: int
+    wait_total: float
+    wait_max: float
+
+
+class Pool(object):
+    __slots__ = ("database", "size", "timeout", "writer_connection", "readers", "_idle", "_writer_lock",
+                 "_reader_stats", "_writer_stats")
+
+    def __init__(self, database: str = "guilds.db", size: int = 4, timeout: float = 5.0):
+        """
+        Long-lived SQLite connections shared by every `Database` context.
+
+        One writer connection serialises all writes, while `size` read-only
+        connections serve lookups concurrently (WAL mode lets them read while
+        the writer is busy).
+        """
+        self.database = database
+        self.size = max(size, 1)
+        self.timeout = timeout
+        self.writer_connection: Optional[Connection] = None
+        self.readers: List[Connection] = []
+        self._idle: Queue[Connection] = Queue()
+        self._writer_lock = Lock()
+        self._reader_stats: WaitStats = {"acquired": 0, "wait_total": 0.0, "wait_max": 0.0}
+        self._writer_stats: WaitStats = {"acquired": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    async def _connect(self, readonly: bool) -> Connection:
+        connection = await connect(database=self.database, detect_types=3)
+        await connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)};")
+        if readonly:
+            await connection.execute("PRAGMA query_only = ON;")
+        else:
+            # WAL is persistent in the file and lets readers work alongside the writer.
+            async with connection.execute("PRAGMA journal_mode = WAL;") as request:
+                await request.fetchone()
+        return connection
+
+    async def open(self) -> "Pool":
+        """
+        This function opens the writer and reader connections.
+
+        :return:`Pool`
+        """
+        self.writer_connection = await self._connect(readonly=False)
+        for _ in range(self.size):
+            connection = await self._connect(readonly=True)
+            self.readers.append(connection)
+            self._idle.put_nowait(connection)
+        return self
+
+    async def close(self) -> None:
+        """
+        This function closes every connection of the pool.
+
+        :return:`None`
+        """
+        for connection in self.readers:
+            await connection.close()
+        self.readers.clear()
+        self._idle = Queue()
+        if self.writer_connection is not None:
+            await self.writer_connection.close()
+            self.writer_connection = None
+
+    @staticmethod
+    def _record(stats: WaitStats, started: float) -> None:
+        waited = perf_counter() - started
+        stats["acquired"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[Connection]:
+        """
+        Borrow a read-only connection, waiting for one to be released if needed.
+        """
+        started = perf_counter()
+        connection = await self._idle.get()
+        self._record(self._reader_stats, started)
+        try:
+            yield connection
+        finally:
+            self._idle.put_nowait(connection)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[Connection]:
+        """
+        Borrow the writer connection exclusively.
+        """
+        started = perf_counter()
+        async with self._writer_lock:
+            self._record(self._writer_stats, started)
+            try:
+                yield self.writer_connection
+            except BaseException:
+                # Never hand a half-done transaction to the next borrower.
+                await self.writer_connection.rollback()
+                raise
+
+    @property
+    def stats(self) -> dict:
+        """
+        Pool wait-time metrics, in seconds.
+
+        :return:`dict`
+        """
+        return {"size": self.size,
+                "idle": self._idle.qsize(),
+                "reader": dict(self._reader_stats),
+                "writer": dict(self._writer_stats)}
@@ -0,0 +1,151 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Threading ------
+from threading import Thread, Event, get_ident
+# ------ Collections ------
+from collections import Counter
+# ------ Functools ------
+from functools import wraps
+# ------ Random ------
+from random import random
+# ------ Time ------
+from time import time
+# ------ Typing ------
+from typing import Any, Callable, Optional, TypeVar
+from types import FrameType
+import os
+import sys
+
+T = TypeVar("T")
+
+
+def collapse(frame: Optional[FrameType]) -> str:
+    """
+    This function renders a stack root first, in the collapsed format flamegraph tools read.
+
+    :return:`str`
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}".replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(Thread):
+
+    def __init__(self, thread_id: int, interval: float, path: str):
+        """
+        Samples the stack of another thread until stopped, then writes the collapsed stacks to `path`.
+        """
+        super().__init__(name="claimify-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.path = path
+        self.stacks: Counter[str] = Counter()
+        self.done = Event()
+
+    def run(self) -> None:
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame=frame)] += 1
+        # Written here, the event loop never touches the disk.
+        if len(self.stacks) != 0:
+            with open(self.path, "w", encoding="utf-8") as file:
+                file.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profiler(object):
+    __slots__ = ("rate", "directory", "interval", "active", "sampled", "skipped")
+
+    def __init__(self, rate: float = 0.0, directory: str = "profiles", interval: float = 0.001):
+        """
+        Profiles a random `rate` (0 to 1) of the decorated handler calls.
+
+        A sampled call is watched by a thread reading the event loop thread
+        stack every `interval` seconds, so the profile also shows whatever
+        ran on the loop meanwhile. Only one call is profiled at a time.
+        With `rate` at 0 a call costs a single comparison.
+        """
+        self.rate = rate
+        self.directory = directory
+        self.interval = interval
+        self.active: bool = False
+        # Metrics.
+        self.sampled: int = 0
+        self.skipped: int = 0
+
+    def set_rate(self, rate: float) -> float:
+        """
+        This function changes the share of calls profiled, at runtime.
+
+        :return:`float` the new rate
+        """
+        self.rate = min(max(rate, 0.0), 1.0)
+        return self.rate
+
+    def profiled(self, name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """
+        This function decorates a coroutine function so a sample of its calls is profiled.
+
+        :return:`Callable`
+        """
+        def decorator(function: Callable[..., T]) -> Callable[..., T]:
+            @wraps(function)
+            async def wrapper(*args: Any, **kwargs: Any) -> T:
+                if not self.rate or random() >= self.rate:
+                    return await function(*args, **kwargs)
+                if self.active:
+                    self.skipped += 1
+                    return await function(*args, **kwargs)
+                self.active = True
+                self.sampled += 1
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{name}-{int(time() * 1000)}-{os.getpid()}.collapsed")
+                sampler = Sampler(thread_id=get_ident(), interval=self.interval, path=path)
+                sampler.start()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    sampler.done.set()
+                    self.active = False
+            return wrapper
+        return decorator
+
+    @property
+    def stats(self) -> dict:
+        """
+        Profiled call counters.
+
+        :return:`dict`
+        """
+        return {"rate": self.rate, "sampled": self.sampled, "skipped": self.skipped}
+
+
+# Configured by the bot from `PROFILE_RATE` and `PROFILE_DIR`.
+PROFILER = Profiler()
+profiled = PROFILER.profiled
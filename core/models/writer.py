@@ -0,0 +1,197 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2023-present MrSniFo
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# ------ Core ------
+from .pool import Pool
+# ------ sqlite ------
+from aiosqlite import Connection
+# ------ sqlite ------
+from sqlite3 import OperationalError
+# ------ Asyncio ------
+from asyncio import Queue, Future, Task, get_running_loop, wait_for, sleep, TimeoutError, CancelledError
+# ------ Time ------
+from time import perf_counter
+# ------ Typing ------
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+Operation = Callable[[Connection], Awaitable[Any]]
+
+
+class WriteQueue(object):
+    __slots__ = ("pool", "batch_size", "interval", "depth", "retries", "_queue", "_task", "batches", "operations",
+                 "failures", "largest_batch", "commit_total", "busy_retries")
+
+    def __init__(self, pool: Pool, batch_size: int = 64, interval: float = 0.005, depth: int = 1024,
+                 retries: int = 5):
+        """
+        Write-behind queue, one task commits the operations of many interactions together.
+
+        An operation is a coroutine function taking the writer connection.
+        Operations of a batch share one transaction but each runs in its own
+        savepoint, so a failing operation only rolls back itself. Callers
+        get their result once the transaction is committed.
+
+        Transactions start with BEGIN IMMEDIATE so the SQLite write lock is
+        held before any operation reads, which keeps read-then-write
+        operations atomic even against other processes. When another
+        process holds the lock past the busy timeout, the whole batch is
+        retried from scratch.
+        """
+        self.pool = pool
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self.depth = depth
+        self.retries = retries
+        self._queue: Queue[Tuple[Operation, Future]] = Queue(maxsize=depth)
+        self._task: Optional[Task] = None
+        # Metrics.
+        self.batches: int = 0
+        self.operations: int = 0
+        self.failures: int = 0
+        self.largest_batch: int = 0
+        self.commit_total: float = 0.0
+        self.busy_retries: int = 0
+
+    def start(self) -> "WriteQueue":
+        """
+        This function starts the writer task.
+
+        :return:`WriteQueue`
+        """
+        self._task = get_running_loop().create_task(self._run(), name="claimify:write-queue")
+        return self
+
+    async def close(self) -> None:
+        """
+        This function commits what is still queued and stops the writer task.
+
+        :return:`None`
+        """
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, operation: Callable[[Connection], Awaitable[T]]) -> T:
+        """
+        This function queues an operation and waits until it is durable.
+
+        :return:`Any` the operation result
+        """
+        future: Future = get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Operation, Future]]:
+        batch = [await self._queue.get()]
+        deadline = perf_counter() + self.interval
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await wait_for(self._queue.get(), timeout=remaining))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _transaction(self, batch: List[Tuple[Operation, Future]]) -> List[Tuple[bool, Any]]:
+        results: List[Tuple[bool, Any]] = []
+        async with self.pool.writer() as connection:
+            await connection.execute("BEGIN IMMEDIATE;")
+            for operation, _ in batch:
+                await connection.execute("SAVEPOINT operation;")
+                try:
+                    results.append((True, await operation(connection)))
+                    await connection.execute("RELEASE operation;")
+                except OperationalError:
+                    # Lock errors abort the whole batch so it can be retried.
+                    raise
+                except Exception as error:
+                    await connection.execute("ROLLBACK TO operation;")
+                    await connection.execute("RELEASE operation;")
+                    results.append((False, error))
+            await connection.commit()
+        return results
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = perf_counter()
+            for attempt in range(self.retries + 1):
+                try:
+                    results = await self._transaction(batch=batch)
+                    break
+                except OperationalError as error:
+                    if "locked" not in str(error) and "busy" not in str(error) or attempt == self.retries:
+                        results = [(False, error)] * len(batch)
+                        break
+                    # Another process holds the write lock, back off and replay the batch.
+                    self.busy_retries += 1
+                    await sleep(self.interval * 2 ** attempt)
+                except Exception as error:
+                    # The transaction itself failed, nothing of this batch is durable.
+                    results = [(False, error)] * len(batch)
+                    break
+
+            self.commit_total += perf_counter() - started
+            self.batches += 1
+            self.operations += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), (success, result) in zip(batch, results):
+                if not success:
+                    self.failures += 1
+                if not future.done():
+                    if success:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(result)
+                self._queue.task_done()
+
+    @property
+    def stats(self) -> dict:
+        """
+        Queue depth and batching metrics.
+
+        :return:`dict`
+        """
+        return {"depth": self._queue.qsize(),
+                "max_depth": self.depth,
+                "batch_size": self.batch_size,
+                "interval": self.interval,
+                "batches": self.batches,
+                "operations": self.operations,
+                "failures": self.failures,
+                "busy_retries": self.busy_retries,
+                "largest_batch": self.largest_batch,
+                "mean_batch": self.operations / self.batches if self.batches else 0.0,
+                "mean_commit": self.commit_total / self.batches if self.batches else 0.0}
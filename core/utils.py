@@ -24,13 +24,71 @@ DEALINGS IN THE SOFTWARE.
 
 # ------ Discord ------
 from discord import Embed
+# ------ Http ------
+from aiohttp import ClientSession
+from codecs import getincrementaldecoder
 # ------ Crypto ------
 import base64
 from Crypto.Cipher import AES
-from Crypto.Hash import SHA256
+from Crypto.Hash import SHA256, HMAC
 from Crypto import Random
+from functools import lru_cache
 # ------ Datetime ------
 from datetime import timedelta
+# ------ Typing ------
+from typing import AsyncIterator
+
+
+# First byte of a sealed envelope, bump it whenever the layout changes.
+ENVELOPE_VERSION: int = 1
+
+
+@lru_cache(maxsize=4096)
+def derive_key(key: str) -> bytes:
+    """
+    This function derives the legacy AES key, once per distinct key.
+
+    :return:`bytes`
+   """
+    return SHA256.new(bytes(key, 'utf-8')).digest()  # use SHA-256 over our key to get a proper-sized AES key
+
+
+@lru_cache(maxsize=4096)
+def derive_guild_key(secret_key: str, owner_id: int) -> bytes:
+    """
+    This function derives the AES-GCM key of a guild, once per (secret, owner).
+
+    :return:`bytes`
+   """
+    return HMAC.new(bytes(secret_key, 'utf-8'), bytes(str(owner_id), 'utf-8'), digestmod=SHA256).digest()
+
+
+def seal(key: bytes, source: str) -> bytes:
+    """
+    This function encrypts data in a single authenticated pass.
+
+    Envelope: version (1) | nonce (12) | tag (16) | ciphertext.
+
+    :return:`bytes`
+   """
+    encryptor = AES.new(key, AES.MODE_GCM, nonce=Random.get_random_bytes(12))
+    data, tag = encryptor.encrypt_and_digest(bytes(source, 'utf-8'))
+    return bytes([ENVELOPE_VERSION]) + encryptor.nonce + tag + data
+
+
+def unseal(key: bytes, source: bytes) -> str:
+    """
+    This function decrypts and authenticates a sealed envelope.
+
+    :return:`str`
+   """
+    try:
+        if source[0] != ENVELOPE_VERSION:
+            raise ValueError
+        decryptor = AES.new(key, AES.MODE_GCM, nonce=source[1:13])
+        return decryptor.decrypt_and_verify(source[29:], source[13:29]).decode("utf-8")
+    except Exception:
+        raise ValueError
 
 
 def encrypt(key: str, source: str, encode=True) -> str:
@@ -39,7 +97,7 @@ def encrypt(key: str, source: str, encode=True) -> str:
 
     :return:`str`
    """
-    key = SHA256.new(bytes(key, 'utf-8')).digest()  # use SHA-256 over our key to get a proper-sized AES key
+    key = derive_key(key)
     iv = Random.new().read(AES.block_size)  # generate IV
     encryptor = AES.new(key, AES.MODE_CBC, iv)
     source = bytes(source, 'utf-8')
@@ -58,7 +116,7 @@ def decrypt(key: str, source: str, decode=True) -> str:
     try:
         if decode:
             source = base64.b64decode(source.encode("latin-1"))
-        key = SHA256.new(bytes(key, 'utf-8')).digest()  # use SHA-256 over our key to get a proper-sized AES key
+        key = derive_key(key)
         iv = source[:AES.block_size]  # extract the IV from the beginning
         decryptor = AES.new(key, AES.MODE_CBC, iv)
         data = decryptor.decrypt(source[AES.block_size:])  # decrypt
@@ -132,3 +190,24 @@ def embed_wrong(msg: str) -> Embed:
     """
     embed = Embed(description=f"**It seems something wrong** :speak_no_evil:\n{msg}", colour=0x36393f)
     return embed
+
+
+async def iter_lines(url: str, chunk_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """
+    This function streams a remote text file line by line, only one chunk is held in memory.
+
+    :return:`AsyncIterator[str]`
+    """
+    decoder = getincrementaldecoder("utf-8")(errors="replace")
+    pending: str = ""
+    async with ClientSession() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                pending += decoder.decode(chunk)
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if len(pending) != 0:
+        yield pending.rstrip("\r")
@@ -24,16 +24,25 @@
 # DEALINGS IN THE SOFTWARE.
 
 
-from core import Bot
-from asyncio import SelectorEventLoop, set_event_loop
+from core.cluster import run, shard_ranges, Supervisor, EVENT_LOOPS
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+from pathlib import Path
+import os
 
 if __name__ == "__main__":
-    loop = SelectorEventLoop()
-    set_event_loop(loop)
-    bot = Bot()
-    try:
-        loop.run_until_complete(bot.run_bot())
-    except KeyboardInterrupt:
-        pass
-    finally:
-        loop.close()
+    load_dotenv(dotenv_path=Path('.env'))
+    parser = ArgumentParser(description="Runs Claimify, optionally as several shard clusters.")
+    parser.add_argument("--clusters", type=int, default=int(os.getenv("CLUSTERS", 1)),
+                        help="worker processes, each one owning a range of shards")
+    parser.add_argument("--shards", type=int, default=os.getenv("SHARD_COUNT"),
+                        help="total shard count, defaults to one shard per cluster")
+    parser.add_argument("--loop", choices=EVENT_LOOPS, default=os.getenv("EVENT_LOOP", "auto"),
+                        help="event loop implementation, auto picks uvloop when it is installed")
+    args = parser.parse_args()
+    shard_count = None if args.shards is None else int(args.shards)
+    if args.clusters > 1:
+        Supervisor(shard_count=shard_count or args.clusters, clusters=args.clusters, loop_name=args.loop).run()
+    else:
+        run(shard_ids=None if shard_count is None else shard_ranges(shard_count=shard_count, clusters=1)[0],
+            shard_count=shard_count, loop_name=args.loop)